@@ -1,3 +1,5 @@
+from sqlalchemy import func, insert, or_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from . import models, schemas
 from .models import Ilan, PhotoUploadSession
@@ -7,6 +9,44 @@ def get_ilanlar(db: Session, skip: int = 0, limit: int = 100):
     """Tüm ilanları getir"""
     return db.query(models.Ilan).offset(skip).limit(limit).all()
 
+def filter_ilanlar(db: Session, q: str = None, min_fiyat: float = None, max_fiyat: float = None,
+                   oda_sayisi: str = None, min_metrekare: float = None, max_metrekare: float = None,
+                   skip: int = 0, limit: int = 20):
+    """Filtrelere uyan ilanların toplam sayısını ve istenen sayfasını döndür (en yeni önce).
+
+    q başlık, mahalle ve açıklamada aranır (PostgreSQL'de trigram indeksleriyle);
+    oda sayısı ve fiyat/metrekare aralıkları bileşik indekslerle karşılanır.
+    """
+    conditions = []
+    if q and q.strip():
+        pattern = _like_pattern(q.strip())
+        conditions.append(or_(
+            models.Ilan.baslik.ilike(pattern, escape="\\"),
+            models.Ilan.mahalle.ilike(pattern, escape="\\"),
+            models.Ilan.aciklama.ilike(pattern, escape="\\")
+        ))
+    if oda_sayisi:
+        conditions.append(models.Ilan.oda_sayisi == oda_sayisi)
+    if min_fiyat is not None:
+        conditions.append(models.Ilan.fiyat >= min_fiyat)
+    if max_fiyat is not None:
+        conditions.append(models.Ilan.fiyat <= max_fiyat)
+    if min_metrekare is not None:
+        conditions.append(models.Ilan.metrekare >= min_metrekare)
+    if max_metrekare is not None:
+        conditions.append(models.Ilan.metrekare <= max_metrekare)
+
+    total = db.query(func.count(models.Ilan.id)).filter(*conditions).scalar()
+    items = (
+        db.query(models.Ilan)
+        .filter(*conditions)
+        .order_by(models.Ilan.id.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+    return total, items
+
 def get_ilan(db: Session, ilan_id: int):
     """ID'ye göre ilan getir"""
     return db.query(models.Ilan).filter(models.Ilan.id == ilan_id).first()
@@ -21,28 +61,75 @@ def create_emlak_ilan(db: Session, ilan: schemas.IlanCreate):
         sokak=ilan.sokak,
         oda_sayisi=ilan.oda_sayisi,
         metrekare=ilan.metrekare,
-        drive_link=ilan.drive_link
+        drive_link=ilan.drive_link,
+        drive_folder_id=ilan.drive_folder_id,
+        photo_count=ilan.photo_count
     )
     db.add(db_ilan)
     db.commit()
     db.refresh(db_ilan)
     return db_ilan 
 
-def delete_emlak_ilan(db: Session, folder_name: str):
-    """İlanı veritabanından sil (başlıkta esnek arama)"""
+def bulk_create_emlak_ilanlar(db: Session, ilanlar: list, checkpoint: dict = None):
+    """Birden fazla ilanı tek INSERT ile kaydet, eklenen satır sayısını döndür.
+
+    checkpoint verilirse içe aktarma kontrol noktası da aynı işlemde yazılır;
+    böylece ilanlar kaydedilip kontrol noktası kaydedilemeden kesilen bir
+    aktarım devam ettirildiğinde aynı grup ikinci kez eklenmez.
+    """
+    if ilanlar:
+        db.execute(insert(models.Ilan), [ilan.dict() for ilan in ilanlar])
+    if checkpoint is not None:
+        db.merge(models.ImportCheckpoint(**checkpoint))
+    db.commit()
+    return len(ilanlar)
+
+def get_import_checkpoint(db: Session, source: str):
+    checkpoint = db.get(models.ImportCheckpoint, source)
+    if checkpoint is None:
+        return None
+    return {
+        "source": checkpoint.source,
+        "line": checkpoint.line,
+        "imported": checkpoint.imported,
+        "skipped": checkpoint.skipped,
+        "failed": checkpoint.failed,
+    }
+
+def _like_pattern(keyword: str) -> str:
+    """LIKE joker karakterlerini kaçışla, içinde geçen arama kalıbı döndür"""
+    escaped = keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+def search_ilanlar(db: Session, keyword: str, limit: int = 10):
+    """Başlık veya mahallede anahtar kelime geçen ilanları en yeniden başlayarak getir.
+
+    PostgreSQL'de baslik/mahalle üzerindeki pg_trgm GIN indeksleri (migrate.py)
+    ILIKE aramasını tablo taramasına gerek kalmadan karşılar.
+    """
+    pattern = _like_pattern(keyword.strip())
+    return (
+        db.query(models.Ilan)
+        .filter(or_(
+            models.Ilan.baslik.ilike(pattern, escape="\\"),
+            models.Ilan.mahalle.ilike(pattern, escape="\\")
+        ))
+        .order_by(models.Ilan.id.desc())
+        .limit(limit)
+        .all()
+    )
+
+def delete_ilan_by_id(db: Session, ilan_id: int):
+    """İlanı ID ile sil"""
     try:
-        # Klasör adındaki #SADEEVIM ve sonrasını temizle
-        base_name = folder_name.split(' #')[0].strip()
-        # Başlığın baş kısmı ile eşleşen ilk ilanı bul
-        ilan = db.query(models.Ilan).filter(models.Ilan.baslik.like(f"%{base_name}%")).first()
-        if not ilan:
-            return False, "İlan bulunamadı"
-        db.delete(ilan)
+        deleted = db.query(models.Ilan).filter(models.Ilan.id == ilan_id).delete(synchronize_session=False)
         db.commit()
+        if not deleted:
+            return False, "İlan bulunamadı"
         return True, "İlan başarıyla silindi"
     except Exception as e:
         db.rollback()
-        return False, f"İlan silinirken hata oluştu: {str(e)}" 
+        return False, f"İlan silinirken hata oluştu: {str(e)}"
 
 def create_photo_upload_session(db: Session, session_data: PhotoUploadSessionCreate):
     db_session = PhotoUploadSession(**session_data.dict())
@@ -54,6 +141,38 @@ def create_photo_upload_session(db: Session, session_data: PhotoUploadSessionCre
 def get_photo_upload_session(db: Session, user_id: str):
     return db.query(PhotoUploadSession).filter(PhotoUploadSession.user_id == user_id).first()
 
+def get_or_create_photo_upload_session(db: Session, session_data: PhotoUploadSessionCreate):
+    """Oturumu getir, yoksa oluştur (başka bir worker aynı anda oluşturduysa onu döndür)"""
+    session = get_photo_upload_session(db, session_data.user_id)
+    if session:
+        return session
+    try:
+        return create_photo_upload_session(db, session_data)
+    except IntegrityError:
+        db.rollback()
+        return get_photo_upload_session(db, session_data.user_id)
+
+def claim_session_folder(db: Session, user_id: str, create_folder):
+    """Oturumun klasör ID'sini döndür; yoksa satır kilidi altında create_folder() ile oluştur.
+
+    Aynı göndericinin fotoğraflarını işleyen iki worker'dan ikincisi kilitte
+    bekler ve ilkinin oluşturduğu klasörü kullanır.
+    """
+    session = (
+        db.query(PhotoUploadSession)
+        .filter(PhotoUploadSession.user_id == user_id)
+        .with_for_update()
+        .first()
+    )
+    try:
+        if not session.drive_folder_id:
+            session.drive_folder_id = create_folder()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return session.drive_folder_id
+
 def update_photo_upload_session(db: Session, user_id: str, **kwargs):
     session = db.query(PhotoUploadSession).filter(PhotoUploadSession.user_id == user_id).first()
     if session:
@@ -63,6 +182,21 @@ def update_photo_upload_session(db: Session, user_id: str, **kwargs):
         db.refresh(session)
     return session
 
+def add_photos_to_session(db: Session, user_id: str, photo_links: list):
+    """Fotoğraf linklerini oturuma ekle (satır kilidiyle, eşzamanlı güncellemelere karşı)"""
+    session = (
+        db.query(PhotoUploadSession)
+        .filter(PhotoUploadSession.user_id == user_id)
+        .with_for_update()
+        .first()
+    )
+    if session:
+        session.photo_links = list(session.photo_links or []) + list(photo_links)
+        session.received_photos = (session.received_photos or 0) + len(photo_links)
+        db.commit()
+        db.refresh(session)
+    return session
+
 def delete_photo_upload_session(db: Session, user_id: str):
     session = db.query(PhotoUploadSession).filter(PhotoUploadSession.user_id == user_id).first()
     if session:
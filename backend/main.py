@@ -7,11 +7,17 @@ from backend.database import engine
 from backend import models
 import os
 
-# Veritabanı tablolarını oluştur
-models.Base.metadata.create_all(bind=engine)
+# Tablolar import sırasında değil, uygulama başlarken oluşturulur; şemayı
+# migrate.py ile yönetiyorsanız DB_CREATE_TABLES_ON_STARTUP=false yapın
+DB_CREATE_TABLES_ON_STARTUP = os.getenv("DB_CREATE_TABLES_ON_STARTUP", "true").lower() in ("1", "true", "yes")
 
 app = FastAPI(title="Emlak API")
 
+@app.on_event("startup")
+def create_tables():
+    if DB_CREATE_TABLES_ON_STARTUP:
+        models.Base.metadata.create_all(bind=engine)
+
 # CORS ayarları
 app.add_middleware(
     CORSMiddleware,
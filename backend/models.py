@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Text, JSON, DateTime
+from sqlalchemy import Column, Integer, String, Float, Text, JSON, DateTime, Index
 from .database import Base
 from datetime import datetime
 
@@ -14,15 +14,36 @@ class Ilan(Base):
     oda_sayisi = Column(String(50))
     metrekare = Column(Float, nullable=True)
     drive_link = Column(String(255), nullable=True)
+    # İlanın fotoğraf klasörü (depolama arka ucundaki ID) ve fotoğraf sayısı
+    drive_folder_id = Column(String(255), nullable=True, index=True)
+    photo_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+    # GET /ilan filtreleri: oda sayısı eşitliği + fiyat/metrekare aralığı, ya da sadece fiyat aralığı
+    __table_args__ = (
+        Index("ix_emlak_ilanlar_oda_sayisi_fiyat", "oda_sayisi", "fiyat"),
+        Index("ix_emlak_ilanlar_oda_sayisi_metrekare", "oda_sayisi", "metrekare"),
+        Index("ix_emlak_ilanlar_fiyat_metrekare", "fiyat", "metrekare"),
+    )
 
 class PhotoUploadSession(Base):
     __tablename__ = "photo_upload_sessions"
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(String, index=True)
+    # Gönderici başına tek oturum; birden fazla worker aynı anda oluşturamaz
+    user_id = Column(String, index=True, unique=True)
     expected_photos = Column(Integer)
     received_photos = Column(Integer, default=0)
     drive_folder_id = Column(String)
     photo_links = Column(JSON, default=list)
     state = Column(String, default="waiting_for_photos")
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow) 
\ No newline at end of file
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow) 
+
+class ImportCheckpoint(Base):
+    """Toplu içe aktarmanın kaldığı yer; ilanlarla aynı işlemde yazılır"""
+    __tablename__ = "bulk_import_checkpoints"
+    source = Column(String(1024), primary_key=True)
+    line = Column(Integer, nullable=False, default=0)
+    imported = Column(Integer, nullable=False, default=0)
+    skipped = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,23 +1,48 @@
 # backend/routers/ilan.py
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Optional
 from backend.database import get_db
 from backend import crud, schemas
 import logging
+import os
 
 # Loglama ayarları
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Sayfa başına varsayılan ve en fazla ilan sayısı
+ILAN_PAGE_SIZE = int(os.getenv("ILAN_PAGE_SIZE", 24))
+ILAN_MAX_PAGE_SIZE = int(os.getenv("ILAN_MAX_PAGE_SIZE", 100))
+
 router = APIRouter()
 
-@router.get("/", response_model=List[schemas.Ilan])
-def get_ilanlar(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """Tüm ilanları getir"""
-    ilanlar = crud.get_ilanlar(db, skip=skip, limit=limit)
-    return ilanlar
+@router.get("/", response_model=schemas.IlanPage)
+def get_ilanlar(
+    q: Optional[str] = Query(None, max_length=100, description="Başlık, mahalle veya açıklamada aranacak metin"),
+    min_fiyat: Optional[float] = Query(None, ge=0),
+    max_fiyat: Optional[float] = Query(None, ge=0),
+    oda_sayisi: Optional[str] = Query(None, max_length=50, description="Örn. 2+1"),
+    min_metrekare: Optional[float] = Query(None, ge=0),
+    max_metrekare: Optional[float] = Query(None, ge=0),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(ILAN_PAGE_SIZE, ge=1, le=ILAN_MAX_PAGE_SIZE),
+    db: Session = Depends(get_db)
+):
+    """Filtrelere uyan ilanları sayfa sayfa getir: {"total": toplam, "items": sayfadaki ilanlar}"""
+    total, ilanlar = crud.filter_ilanlar(
+        db,
+        q=q,
+        min_fiyat=min_fiyat,
+        max_fiyat=max_fiyat,
+        oda_sayisi=oda_sayisi,
+        min_metrekare=min_metrekare,
+        max_metrekare=max_metrekare,
+        skip=skip,
+        limit=limit
+    )
+    return {"total": total, "items": ilanlar}
 
 @router.post("/", response_model=schemas.Ilan)
 def create_ilan(ilan: schemas.IlanCreate, db: Session = Depends(get_db)):
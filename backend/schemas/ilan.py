@@ -18,6 +18,8 @@ class IlanBase(BaseModel):
     oda_sayisi: str
     metrekare: Optional[float] = None
     drive_link: Optional[str] = None
+    drive_folder_id: Optional[str] = None
+    photo_count: int = 0
 
 class IlanCreate(IlanBase):
     pass
@@ -28,6 +30,10 @@ class Ilan(IlanBase):
     class Config:
         from_attributes = True
 
+class IlanPage(BaseModel):
+    total: int
+    items: List[Ilan]
+
 class IlanResponse(BaseModel):
     id: int
     baslik: str
@@ -38,6 +44,8 @@ class IlanResponse(BaseModel):
     oda_sayisi: str
     metrekare: Optional[float] = None
     drive_link: Optional[str] = None
+    drive_folder_id: Optional[str] = None
+    photo_count: Optional[int] = 0
 
     class Config:
         from_attributes = True
@@ -0,0 +1,304 @@
+# bench/fakes.py
+"""OpenAI, Twilio ve Google Drive için ağ gerektirmeyen sahte istemciler.
+
+Benchmark ve yerel denemelerde gerçek servislerin yerine geçer; her birinin
+gecikmesi ayarlanabilir.
+"""
+
+import asyncio
+import io
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from types import SimpleNamespace
+
+import requests
+from requests.adapters import BaseAdapter
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+FAKE_MEDIA_BASE_URL = "https://api.twilio.com/fake-media/"
+
+
+class _Request:
+    """googleapiclient HttpRequest taklidi"""
+
+    def __init__(self, drive, func, name):
+        self.drive = drive
+        self.latency = drive.latency
+        self.func = func
+        self.name = name
+
+    def execute(self, num_retries=0):
+        with self.drive._lock:
+            self.drive.calls[self.name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self.func()
+
+
+class FakeDriveService:
+    """Bellekte çalışan Drive v3 servis taklidi"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.items = {}
+        self.permissions_by_file = {}
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def files(self):
+        return _Files(self)
+
+    def permissions(self):
+        return _Permissions(self)
+
+    def new_batch_http_request(self, callback=None):
+        return _Batch(self, callback)
+
+    def _call(self, name, func):
+        return _Request(self, func, name)
+
+
+class _Files:
+    def __init__(self, drive):
+        self.drive = drive
+
+    def create(self, body=None, media_body=None, fields=None, **kwargs):
+        def run():
+            file_id = uuid.uuid4().hex
+            item = {
+                'id': file_id,
+                'name': body.get('name'),
+                'mimeType': body.get('mimeType', getattr(media_body, 'mimetype', lambda: None)()),
+                'parents': body.get('parents', []),
+                'size': 0,
+            }
+            if media_body is not None:
+                item['size'] = media_body.size()
+            with self.drive._lock:
+                self.drive.items[file_id] = item
+            return {'id': file_id, 'name': item['name']}
+        return self.drive._call('files.create', run)
+
+    def copy(self, fileId=None, body=None, fields=None, **kwargs):
+        def run():
+            with self.drive._lock:
+                source = self.drive.items[fileId]
+                file_id = uuid.uuid4().hex
+                self.drive.items[file_id] = {
+                    **source,
+                    'id': file_id,
+                    'name': (body or {}).get('name', source['name']),
+                    'parents': (body or {}).get('parents', source['parents']),
+                }
+            return {'id': file_id}
+        return self.drive._call('files.copy', run)
+
+    def list(self, q='', fields=None, pageSize=100, pageToken=None, **kwargs):
+        def run():
+            with self.drive._lock:
+                items = [item for item in self.drive.items.values() if _matches(item, q)]
+            start = int(pageToken or 0)
+            page = items[start:start + pageSize]
+            result = {'files': [{'id': i['id'], 'name': i['name'], 'parents': i['parents']} for i in page]}
+            if start + pageSize < len(items):
+                result['nextPageToken'] = str(start + pageSize)
+            return result
+        return self.drive._call('files.list', run)
+
+    def get(self, fileId=None, fields=None, **kwargs):
+        def run():
+            with self.drive._lock:
+                item = self.drive.items[fileId]
+            return {'id': item['id'], 'name': item['name'], 'parents': item['parents']}
+        return self.drive._call('files.get', run)
+
+    def delete(self, fileId=None, **kwargs):
+        def run():
+            with self.drive._lock:
+                removed = {fileId}
+                changed = True
+                while changed:
+                    changed = False
+                    for item_id, item in self.drive.items.items():
+                        if item_id not in removed and removed.intersection(item['parents']):
+                            removed.add(item_id)
+                            changed = True
+                for item_id in removed:
+                    self.drive.items.pop(item_id, None)
+            return None
+        return self.drive._call('files.delete', run)
+
+
+class _Permissions:
+    def __init__(self, drive):
+        self.drive = drive
+
+    def create(self, fileId=None, body=None, **kwargs):
+        def run():
+            with self.drive._lock:
+                self.drive.permissions_by_file.setdefault(fileId, []).append(body)
+            return {'id': 'anyoneWithLink'}
+        return self.drive._call('permissions.create', run)
+
+
+class _Batch:
+    """BatchHttpRequest taklidi; istekler tek çağrı gecikmesiyle çalıştırılır"""
+
+    def __init__(self, drive, callback):
+        self.drive = drive
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        self.requests.append((request_id or str(len(self.requests)), request, callback))
+
+    def execute(self):
+        def run():
+            for request_id, request, callback in self.requests:
+                try:
+                    response, error = request.func(), None
+                except Exception as e:
+                    response, error = None, e
+                (callback or self.callback)(request_id, response, error)
+        self.drive._call('batch', run).execute()
+
+
+def _matches(item, q):
+    """Drive arama sorgusunun benchmark'ta kullanılan alt kümesini uygular"""
+    if "mimeType='application/vnd.google-apps.folder'" in q and item['mimeType'] != FOLDER_MIME_TYPE:
+        return False
+    match = re.search(r"name contains '([^']*)'", q)
+    if match and match.group(1) not in item['name']:
+        return False
+    match = re.search(r"name='([^']*)'", q)
+    if match and match.group(1) != item['name']:
+        return False
+    match = re.search(r"'([^']*)' in parents", q)
+    if match and match.group(1) not in item['parents']:
+        return False
+    return True
+
+
+class FakeOpenAI:
+    """openai.AsyncOpenAI taklidi; mesajdan basit bir ilan JSON'u üretir"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, model=None, messages=None, **kwargs):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return _completion(messages)
+
+
+def _completion(messages):
+    text = messages[-1]["content"]
+    words = text.split()
+    oda = re.search(r"\d\s*\+\s*\d", text)
+    metrekare = re.search(r"(\d+)\s*m", text)
+    content = json.dumps({
+        "konum": words[0] if words else "Moda",
+        "sokak": "Bahariye Caddesi",
+        "oda_sayisi": oda.group(0) if oda else "2+1",
+        "metrekare": int(metrekare.group(1)) if metrekare else 100,
+        "fiyat": 2500000,
+    }, ensure_ascii=False)
+    prompt = "".join(message["content"] for message in messages)
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=SimpleNamespace(prompt_tokens=len(prompt) // 4, completion_tokens=len(content) // 4, total_tokens=(len(prompt) + len(content)) // 4),
+    )
+
+
+class FakeTwilioClient:
+    """twilio.rest.Client taklidi; sadece messages.create desteklenir"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.sent = []
+        self._lock = threading.Lock()
+        self.messages = SimpleNamespace(create=self._create)
+
+    def _create(self, from_=None, body=None, to=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.sent.append((to, body))
+            sid = f"SMFAKE{len(self.sent):08d}"
+        return SimpleNamespace(sid=sid)
+
+
+class FakeMediaAdapter(BaseAdapter):
+    """Twilio medya URL'lerine JPEG döndüren requests adaptörü.
+
+    Her URL için farklı (URL'den türetilmiş renk bloklu) bir görsel üretilir,
+    aynı URL her zaman aynı baytları döndürür; böylece fotoğraf tekrar
+    kontrolü yalnızca gerçekten tekrarlanan medyada devreye girer.
+    """
+
+    def __init__(self, latency: float = 0.0, size: int = 1280):
+        super().__init__()
+        self.latency = latency
+        self.size = size
+        self.calls = 0
+        self._payloads = {}
+        self._lock = threading.Lock()
+
+    def payload(self, url: str) -> bytes:
+        with self._lock:
+            data = self._payloads.get(url)
+        if data is None:
+            data = _sample_jpeg(self.size, seed=url)
+            with self._lock:
+                self._payloads[url] = data
+        return data
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        response = requests.Response()
+        response.status_code = 200
+        response.headers['Content-Type'] = 'image/jpeg'
+        response.raw = io.BytesIO(self.payload(request.url))
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+_base_images = {}
+
+
+def _sample_jpeg(size, seed=None):
+    from PIL import Image
+
+    base = _base_images.get(size)
+    if base is None:
+        base = Image.new("RGB", (size, size * 3 // 4))
+        pixels = base.load()
+        for x in range(0, base.width, 4):
+            for y in range(0, base.height, 4):
+                pixels[x, y] = (x % 256, y % 256, (x * y) % 256)
+        _base_images[size] = base
+    image = base.copy()
+    if seed is not None:
+        rng = random.Random(seed)
+        block = size // 8
+        for _ in range(12):
+            x, y = rng.randrange(0, image.width - block), rng.randrange(0, image.height - block)
+            color = tuple(rng.randrange(256) for _ in range(3))
+            image.paste(color, (x, y, x + block, y + block))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
@@ -0,0 +1,131 @@
+# bench/startup.py
+"""Soğuk başlangıç ölçümü: modül import süresi ve ilk isteğin gecikmesi.
+
+Her ölçüm ayrı bir Python sürecinde yapılır (modül önbelleği boş), gerçek
+servis kimlik bilgisi gerekmez. bot.webhook için kurallarla çözülen bir ilan
+mesajı, backend.main için GET /ilan/ isteği gönderilir. Import sonrasında
+yüklenmiş ağır kütüphaneler de raporlanır.
+
+Kullanım:
+    python -m bench.startup --runs 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TARGETS = {
+    "bot": ("bot.webhook", "POST", "/webhook"),
+    "api": ("backend.main", "GET", "/ilan/"),
+}
+HEAVY_MODULES = ["openai", "googleapiclient.discovery", "twilio.rest", "PIL.Image", "boto3"]
+FIRST_MESSAGE = {
+    "From": "whatsapp:+905550000000",
+    "Body": "🏠 Moda\n2+1 120 m² 3.500.000 TL\nBahariye Caddesi",
+    "NumMedia": "0",
+    "MessageSid": "SMSTARTUP0001",
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Import ve ilk istek süresi ölçümü")
+    parser.add_argument("--runs", type=int, default=5, help="Hedef başına ölçüm sayısı")
+    parser.add_argument("--target", choices=sorted(TARGETS), action="append", help="Varsayılan: hepsi")
+    parser.add_argument("--child", choices=sorted(TARGETS), help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+async def _first_request(app, method, path):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://startup") as client:
+            started = time.perf_counter()
+            if method == "POST":
+                response = await client.post(path, data=FIRST_MESSAGE)
+            else:
+                response = await client.get(path)
+            return time.perf_counter() - started, response.status_code
+
+
+def measure(target: str) -> dict:
+    """Alt süreçte çalışır: import ve ilk istek sürelerini ölç"""
+    import importlib
+
+    module_name, method, path = TARGETS[target]
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    import_seconds = time.perf_counter() - started
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+    first_request_seconds, status = asyncio.run(_first_request(module.app, method, path))
+    return {
+        "import_seconds": import_seconds,
+        "first_request_seconds": first_request_seconds,
+        "status": status,
+        "heavy_modules": loaded,
+    }
+
+
+def child_environment(workdir: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'startup.db')}",
+        "STATE_STORE_PATH": os.path.join(workdir, "state.db"),
+        "LOG_SAMPLE_RATE": "0",
+        "PYTHONDONTWRITEBYTECODE": "1",
+    })
+    # Kimlik bilgisi olmadan import edilebilmeli
+    for name in ("OPENAI_API_KEY", "TWILIO_ACCOUNT_SID", "TWILIO_AUTH_TOKEN", "GOOGLE_DRIVE_CREDENTIALS_FILE"):
+        env.pop(name, None)
+    return env
+
+
+def run_child(target: str) -> dict:
+    workdir = tempfile.mkdtemp(prefix="wpbot-startup-")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-m", "bench.startup", "--child", target],
+        cwd=root, env=child_environment(workdir), capture_output=True, text=True
+    )
+    total = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise RuntimeError(f"{target} ölçümü başarısız:\n{completed.stderr}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["process_seconds"] = total
+    return result
+
+
+def report(results: dict):
+    print(f"{'hedef':<6}{'import ms':>12}{'ilk istek ms':>15}{'süreç ms':>12}  ağır modüller")
+    for target, runs in results.items():
+        imports = statistics.median(r["import_seconds"] for r in runs) * 1000
+        first = statistics.median(r["first_request_seconds"] for r in runs) * 1000
+        process = statistics.median(r["process_seconds"] for r in runs) * 1000
+        statuses = {r["status"] for r in runs}
+        heavy = ", ".join(runs[-1]["heavy_modules"]) or "-"
+        print(f"{target:<6}{imports:>12.1f}{first:>15.1f}{process:>12.1f}  {heavy}  (HTTP {sorted(statuses)})")
+
+
+def main():
+    args = parse_args()
+    if args.child:
+        print(json.dumps(measure(args.child)))
+        return
+    results = {}
+    for target in args.target or sorted(TARGETS):
+        results[target] = [run_child(target) for _ in range(args.runs)]
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
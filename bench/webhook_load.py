@@ -0,0 +1,207 @@
+# bench/webhook_load.py
+"""Webhook için ağ gerektirmeyen uçtan uca yük testi.
+
+bot.webhook:app ASGI uygulamasını sahte Twilio form verileriyle çalıştırır;
+OpenAI, Twilio, medya URL'leri ve Drive yerel sahte istemcilerle değiştirilir,
+veritabanı olarak SQLite kullanılır. Her konuşma aşaması için throughput ve
+p50/p95/p99 gecikmeleri raporlanır.
+
+Kullanım:
+    python -m bench.webhook_load --conversations 50 --concurrency 10
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+STAGES = ["ilan", "media", "tamamla", "sil", "sil_ara", "sil_sec"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Webhook yük testi (sahte servislerle)")
+    parser.add_argument("--conversations", type=int, default=50, help="Toplam konuşma sayısı")
+    parser.add_argument("--concurrency", type=int, default=10, help="Aynı anda yürüyen konuşma sayısı")
+    parser.add_argument("--albums", type=int, default=2, help="Konuşma başına medya webhook'u sayısı")
+    parser.add_argument("--photos", type=int, default=3, help="Webhook başına fotoğraf sayısı")
+    parser.add_argument("--freeform-ratio", type=float, default=0.2, help="Kurallarla çözülemeyip GPT'ye giden ilan oranı")
+    parser.add_argument("--openai-latency", type=float, default=0.5, help="Sahte OpenAI gecikmesi (sn)")
+    parser.add_argument("--twilio-latency", type=float, default=0.1, help="Sahte Twilio API gecikmesi (sn)")
+    parser.add_argument("--media-latency", type=float, default=0.05, help="Sahte medya indirme gecikmesi (sn)")
+    parser.add_argument("--drive-latency", type=float, default=0.05, help="Sahte Drive çağrısı gecikmesi (sn)")
+    parser.add_argument("--database-url", default=None, help="Varsayılan: geçici SQLite dosyası")
+    parser.add_argument(
+        "--storage", choices=("drive", "local"), default="drive",
+        help="drive: sahte Drive servisi, local: geçici dizine gerçek dosya yazan yerel depolama"
+    )
+    return parser.parse_args()
+
+
+def configure_environment(args):
+    """Uygulama modülleri import edilmeden önce ortamı ayarla"""
+    workdir = tempfile.mkdtemp(prefix="wpbot-bench-")
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    os.environ.setdefault("TWILIO_ACCOUNT_SID", "ACbench")
+    os.environ.setdefault("TWILIO_AUTH_TOKEN", "bench")
+    os.environ.setdefault("TWILIO_PHONE_NUMBER", "+10000000000")
+    os.environ.setdefault("GOOGLE_DRIVE_MAIN_FOLDER_ID", "bench-root")
+    os.environ.setdefault("STATE_STORE_PATH", os.path.join(workdir, "state.db"))
+    os.environ.setdefault("LOG_SAMPLE_RATE", "0")
+    os.environ["STORAGE_BACKEND"] = args.storage
+    os.environ.setdefault("STORAGE_LOCAL_PATH", os.path.join(workdir, "storage"))
+    return workdir
+
+
+def install_fakes(args):
+    """Dış servis istemcilerini sahteleriyle değiştir"""
+    from bench.fakes import FakeDriveService, FakeOpenAI, FakeTwilioClient, FakeMediaAdapter, FAKE_MEDIA_BASE_URL
+    from bot import webhook, gpt_parser, media
+    from drive_service import uploader
+
+    drive = FakeDriveService(latency=args.drive_latency)
+    drive.items["bench-root"] = {
+        "id": "bench-root", "name": "Ana Klasör", "mimeType": "application/vnd.google-apps.folder",
+        "parents": [], "size": 0,
+    }
+    openai_client = FakeOpenAI(latency=args.openai_latency)
+    twilio = FakeTwilioClient(latency=args.twilio_latency)
+    media_adapter = FakeMediaAdapter(latency=args.media_latency)
+
+    uploader.get_drive_service = lambda: drive
+    gpt_parser.client = openai_client
+    webhook.twilio_client = twilio
+    media.get_http_session().mount(FAKE_MEDIA_BASE_URL, media_adapter)
+    return {"drive": drive, "openai": openai_client, "twilio": twilio, "media": media_adapter}
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # En yakın sıra yöntemi: değerlerin en az pct%'i bu değere eşit veya küçük
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def post(self, client, stage, data):
+        started = time.perf_counter()
+        response = await client.post("/webhook", data=data)
+        self.latencies[stage].append(time.perf_counter() - started)
+        if response.status_code != 200:
+            self.errors[stage] += 1
+        return response
+
+
+async def run_conversation(client, recorder, index, args):
+    from bench.fakes import FAKE_MEDIA_BASE_URL
+
+    phone = f"whatsapp:+90555{index:07d}"
+    sid = 0
+
+    def form(body="", media=0):
+        nonlocal sid
+        sid += 1
+        data = {"From": phone, "Body": body, "NumMedia": str(media), "MessageSid": f"SM{index:06d}{sid:04d}"}
+        for i in range(media):
+            data[f"MediaUrl{i}"] = f"{FAKE_MEDIA_BASE_URL}{index}/{sid}/{i}"
+            data[f"MediaContentType{i}"] = "image/jpeg"
+        return data
+
+    # Mahalle adında rakam olmamalı (ilk satır kuralı rakam içeren satırı mahalle saymaz)
+    mahalle = "Semt" + "".join(chr(ord("a") + int(digit)) for digit in str(index))
+    # Konuşmaların freeform_ratio kadarı kurallarla çözülemeyen serbest metin gönderir
+    if int((index + 1) * args.freeform_ratio) > int(index * args.freeform_ratio):
+        listing = f"{mahalle} civarında satılık daire, fiyat ve detaylar için arayın"
+    else:
+        listing = f"🏠 {mahalle}\n2+1 120 m² 3.500.000 TL\nBahariye Caddesi"
+    await recorder.post(client, "ilan", form(listing))
+    for _ in range(args.albums):
+        await recorder.post(client, "media", form(media=args.photos))
+    await recorder.post(client, "tamamla", form("/tamamla"))
+    await recorder.post(client, "sil", form("/sil"))
+    await recorder.post(client, "sil_ara", form(mahalle))
+    await recorder.post(client, "sil_sec", form("1"))
+
+
+async def run(args):
+    import httpx
+    from bot import webhook
+
+    recorder = Recorder()
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def bounded(index):
+        async with semaphore:
+            await run_conversation(client, recorder, index, args)
+
+    transport = httpx.ASGITransport(app=webhook.app)
+    async with webhook.app.router.lifespan_context(webhook.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(bounded(i) for i in range(args.conversations)))
+            elapsed = time.perf_counter() - started
+            job_stats = (await client.get("/jobs/stats")).json()
+    return recorder, elapsed, job_stats
+
+
+def report(recorder, elapsed, job_stats, fakes):
+    total = sum(len(v) for v in recorder.latencies.values())
+    print(f"\nToplam istek: {total}  Süre: {elapsed:.2f} sn  Throughput: {total / elapsed:.1f} istek/sn")
+    print(f"{'aşama':<10}{'adet':>7}{'hata':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for stage in STAGES:
+        values = recorder.latencies.get(stage, [])
+        if not values:
+            continue
+        print(
+            f"{stage:<10}{len(values):>7}{recorder.errors[stage]:>7}"
+            f"{percentile(values, 50) * 1000:>10.1f}{percentile(values, 95) * 1000:>10.1f}"
+            f"{percentile(values, 99) * 1000:>10.1f}{max(values) * 1000:>10.1f}"
+        )
+    print(
+        f"\nArka plan işleri: tamamlanan={job_stats.get('completed')} hatalı={job_stats.get('failed')} "
+        f"ort. gecikme={job_stats.get('avg_wait_seconds', 0) + job_stats.get('avg_run_seconds', 0):.3f} sn "
+        f"maks={job_stats.get('max_latency_seconds')} sn"
+    )
+    parser = job_stats.get("parser", {})
+    print(
+        f"Çözümleyici: hızlı yol={parser.get('fast_path')} GPT={parser.get('gpt_calls')} oran={parser.get('fast_path_ratio')} "
+        f"token (prompt/completion)={parser.get('prompt_tokens')}/{parser.get('completion_tokens')}"
+    )
+    print(
+        f"Dış çağrılar: OpenAI={fakes['openai'].calls} Twilio={len(fakes['twilio'].sent)} "
+        f"medya={fakes['media'].calls} Drive={dict(fakes['drive'].calls)}"
+    )
+    if os.environ.get("STORAGE_BACKEND") == "local":
+        root = os.environ["STORAGE_LOCAL_PATH"]
+        files = [os.path.join(path, name) for path, _, names in os.walk(root) for name in names]
+        size = sum(os.path.getsize(path) for path in files)
+        print(f"Yerel depolama: {len(files)} dosya, {size / (1024 * 1024):.1f} MB ({root})")
+
+
+def main():
+    args = parse_args()
+    configure_environment(args)
+
+    from backend.database import engine
+    from backend.models import Base
+
+    Base.metadata.create_all(bind=engine)
+    fakes = install_fakes(args)
+    recorder, elapsed, job_stats = asyncio.run(run(args))
+    report(recorder, elapsed, job_stats, fakes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+# bot/bulk_import.py
+"""Dışa aktarılmış WhatsApp sohbetlerinden (.txt veya .zip) toplu ilan aktarımı.
+
+Sohbet dosyası satır satır okunur, mesajlara bölünür ve ilana benzeyen
+mesajlar parse_message_to_json ile eşzamanlı çözümlenip gruplar halinde
+veritabanına yazılır. Kontrol noktası (kalınan satır) her grupla aynı
+veritabanı işleminde güncellenir; aynı komut tekrar çalıştırıldığında kalınan
+yerden devam edilir ve yarıda kesilen bir grup iki kez eklenmez.
+Bellek kullanımı dosya boyutundan bağımsızdır (en fazla bir grup mesaj).
+
+Kullanım:
+    python -m bot.bulk_import sohbet.txt --batch-size 50
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import re
+import sys
+import time
+import zipfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.fast_parser import extract_listing
+from bot.gpt_parser import parse_message_to_json, OPENAI_CONCURRENCY
+from bot.listing import ilan_from_details
+
+BULK_IMPORT_BATCH_SIZE = int(os.getenv("BULK_IMPORT_BATCH_SIZE", 50))
+# Bu uzunluğun altındaki mesajlar ilan sayılmaz
+BULK_IMPORT_MIN_LENGTH = int(os.getenv("BULK_IMPORT_MIN_LENGTH", 20))
+
+# Android: "12.03.2021 14:22 - Ahmet: mesaj"
+# iOS:     "[12.03.2021 14:22:05] Ahmet: mesaj"
+MESSAGE_START_RE = re.compile(
+    r"^\[?(\d{1,2}[./]\d{1,2}[./]\d{2,4}),? (\d{1,2}:\d{2}(?::\d{2})?(?:\s?[APap][Mm])?)\]?(?: -)? ([^:]+?): (.*)$"
+)
+# Android'de satır başında tarih olup gönderen olmayan satırlar sistem mesajıdır
+SYSTEM_LINE_RE = re.compile(r"^\[?\d{1,2}[./]\d{1,2}[./]\d{2,4},? \d{1,2}:\d{2}")
+MEDIA_OMITTED = {"<medya dahil edilmedi>", "<media omitted>", "<medya atlandı>"}
+# WhatsApp dışa aktarımlarındaki görünmez yön işaretleri
+_DIRECTION_MARKS = dict.fromkeys(map(ord, "‎‏‪‬"), None)
+
+
+def open_export(path: str):
+    """Sohbet dosyasını metin akışı olarak aç (.zip içindeki ilk .txt dahil)"""
+    if zipfile.is_zipfile(path):
+        archive = zipfile.ZipFile(path)
+        names = [name for name in archive.namelist() if name.lower().endswith(".txt")]
+        if not names:
+            raise ValueError(f"Zip içinde .txt sohbet dosyası yok: {path}")
+        return io.TextIOWrapper(archive.open(names[0]), encoding="utf-8-sig", errors="replace")
+    return open(path, encoding="utf-8-sig", errors="replace")
+
+
+def iter_chat_messages(lines):
+    """Sohbet satırlarını mesajlara böl.
+
+    Çok satırlı mesajlar birleştirilir. Her mesaj için
+    {"line", "timestamp", "sender", "text"} sözlüğü üretir; "line" mesajın
+    başladığı satır numarasıdır (1'den başlar).
+    """
+    current = None
+    for line_no, line in enumerate(lines, start=1):
+        line = line.rstrip("\r\n").translate(_DIRECTION_MARKS)
+        match = MESSAGE_START_RE.match(line)
+        if match:
+            if current:
+                yield current
+            date, clock, sender, text = match.groups()
+            current = {"line": line_no, "timestamp": f"{date} {clock}", "sender": sender.strip(), "text": text}
+        elif SYSTEM_LINE_RE.match(line):
+            if current:
+                yield current
+            current = None
+        elif current is not None:
+            current["text"] += "\n" + line
+    if current:
+        yield current
+
+
+def looks_like_listing(text: str) -> bool:
+    """Mesajda oda sayısı, metrekare veya fiyattan en az ikisi varsa ilan say"""
+    text = text.strip()
+    if len(text) < BULK_IMPORT_MIN_LENGTH or text.lower() in MEDIA_OMITTED:
+        return False
+    fields = extract_listing(text)
+    found = sum(1 for name in ("oda_sayisi", "metrekare", "fiyat") if fields[name]["value"])
+    return found >= 2
+
+
+async def _parse_one(message: dict, limit: asyncio.Semaphore):
+    # Aynı anda en fazla OPENAI_CONCURRENCY mesaj çözümlenir; böylece GPT süre
+    # bütçesi sıra beklerken tükenmez. Kurallı yedek sonuç eksik alanlarla
+    # kaydedilmesin diye GPT hatası mesajı hatalı sayar.
+    async with limit:
+        try:
+            return await parse_message_to_json(message["text"], fallback=False)
+        except Exception as e:
+            print(f"Satır {message['line']} çözümlenemedi: {type(e).__name__}: {str(e)}")
+            return None
+
+
+def load_checkpoint(source: str) -> dict:
+    """Dosyanın veritabanındaki kontrol noktasını oku (yoksa baştan başla)"""
+    from backend.crud import get_import_checkpoint
+    from backend.database import SessionLocal, engine
+    from backend.models import ImportCheckpoint
+
+    ImportCheckpoint.__table__.create(bind=engine, checkfirst=True)
+    db = SessionLocal()
+    try:
+        checkpoint = get_import_checkpoint(db, source)
+    finally:
+        db.close()
+    return checkpoint or {"source": source, "line": 0, "imported": 0, "skipped": 0, "failed": 0}
+
+
+def _write_batch(ilanlar: list, checkpoint: dict = None) -> int:
+    from backend.crud import bulk_create_emlak_ilanlar
+    from backend.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return bulk_create_emlak_ilanlar(db, ilanlar, checkpoint=checkpoint)
+    finally:
+        db.close()
+
+
+async def import_chat(path: str, resume: bool = True, batch_size: int = BULK_IMPORT_BATCH_SIZE,
+                      sender: str = None, dry_run: bool = False, on_progress=None) -> dict:
+    """Sohbet dosyasındaki ilanları içe aktar, özet istatistikleri döndür.
+
+    Mesajlar batch_size'lık gruplar halinde, aynı anda en fazla
+    OPENAI_CONCURRENCY tanesi çözümlenir; GPT'ye ulaşılamayan mesajlar kurallı
+    sonuçla kaydedilmez, hatalı sayılır. Her grup, kontrol
+    noktasıyla birlikte tek işlemde yazılır. resume=False ise kontrol noktası
+    okunmaz ve yazılmaz. dry_run'da veritabanına hiç dokunulmaz; ilan sayısı
+    "imported" yerine "parsed" olarak raporlanır. on_progress verilirse her
+    gruptan sonra güncel istatistiklerle çağrılır.
+    """
+    source = os.path.abspath(path)
+    use_checkpoint = resume and not dry_run
+    if use_checkpoint:
+        checkpoint = await asyncio.to_thread(load_checkpoint, source)
+    else:
+        checkpoint = {"source": source, "line": 0, "imported": 0, "skipped": 0, "failed": 0}
+    if dry_run:
+        checkpoint["parsed"] = checkpoint.pop("imported")
+    resume_after = checkpoint["line"]
+    limit = asyncio.Semaphore(OPENAI_CONCURRENCY)
+    started = time.perf_counter()
+    processed = 0
+
+    async def flush(batch):
+        nonlocal processed
+        results = await asyncio.gather(*(_parse_one(message, limit) for message in batch))
+        ilanlar = []
+        for result in results:
+            if result is None:
+                checkpoint["failed"] += 1
+            elif not result:
+                checkpoint["skipped"] += 1
+            else:
+                ilanlar.append(ilan_from_details(result))
+        checkpoint["line"] = batch[-1]["line"]
+        processed += len(batch)
+        if dry_run:
+            checkpoint["parsed"] += len(ilanlar)
+        else:
+            checkpoint["imported"] += len(ilanlar)
+            if ilanlar or use_checkpoint:
+                await asyncio.to_thread(_write_batch, ilanlar, checkpoint if use_checkpoint else None)
+        if on_progress:
+            elapsed = time.perf_counter() - started
+            on_progress({**checkpoint, "processed": processed, "rate": processed / elapsed if elapsed else 0.0})
+
+    batch = []
+    with open_export(path) as lines:
+        for message in iter_chat_messages(lines):
+            if message["line"] <= resume_after:
+                continue
+            if sender and message["sender"] != sender:
+                continue
+            if not looks_like_listing(message["text"]):
+                continue
+            batch.append(message)
+            if len(batch) >= batch_size:
+                await flush(batch)
+                batch = []
+        if batch:
+            await flush(batch)
+
+    return {**checkpoint, "processed": processed, "elapsed_seconds": round(time.perf_counter() - started, 2)}
+
+
+def _count_label(stats: dict) -> str:
+    if "parsed" in stats:
+        return f"çözümlenen={stats['parsed']}"
+    return f"aktarılan={stats['imported']}"
+
+
+def print_progress(stats: dict):
+    print(
+        f"satır={stats['line']} işlenen={stats['processed']} {_count_label(stats)} "
+        f"atlanan={stats['skipped']} hatalı={stats['failed']} hız={stats['rate']:.1f} mesaj/sn",
+        flush=True
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="WhatsApp sohbet dışa aktarımından toplu ilan aktarımı")
+    parser.add_argument("path", help="Sohbet dosyası (.txt veya .zip)")
+    parser.add_argument("--no-checkpoint", action="store_true", help="Kontrol noktası tutma, baştan başla")
+    parser.add_argument("--batch-size", type=int, default=BULK_IMPORT_BATCH_SIZE, help="Grup başına mesaj sayısı")
+    parser.add_argument("--sender", default=None, help="Sadece bu göndericinin mesajlarını aktar")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Çözümle ama veritabanına (kontrol noktası dahil) yazma")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    stats = asyncio.run(import_chat(
+        args.path,
+        resume=not args.no_checkpoint,
+        batch_size=args.batch_size,
+        sender=args.sender,
+        dry_run=args.dry_run,
+        on_progress=print_progress
+    ))
+    print(
+        f"\nTamamlandı: {_count_label(stats)} atlanan={stats['skipped']} "
+        f"hatalı={stats['failed']} süre={stats['elapsed_seconds']} sn"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# bot/coalescer.py
+
+import asyncio
+import os
+import time
+
+# Albüm birleştirme penceresi: aynı göndericiden bu süre içinde gelen medya
+# webhook'ları tek bir işte toplanır. 0 verilirse birleştirme kapalıdır.
+MEDIA_COALESCE_WINDOW_MS = int(os.getenv("MEDIA_COALESCE_WINDOW_MS", 1500))
+# İlk medyadan sonra en fazla bu kadar beklenir
+MEDIA_COALESCE_MAX_WAIT_MS = int(os.getenv("MEDIA_COALESCE_MAX_WAIT_MS", 5000))
+
+
+class MediaCoalescer:
+    """WhatsApp albümlerini gönderici başına debounce penceresiyle birleştirir.
+
+    Her yeni medya webhook'u pencereyi yeniden başlatır; pencere dolduğunda
+    (veya en fazla bekleme süresi aşıldığında) toplanan medyalar tek seferde
+    on_flush(key, items, context) ile teslim edilir.
+    """
+
+    def __init__(self, on_flush, window_ms: int = MEDIA_COALESCE_WINDOW_MS,
+                 max_wait_ms: int = MEDIA_COALESCE_MAX_WAIT_MS):
+        self.on_flush = on_flush
+        self.window = window_ms / 1000
+        self.max_wait = max(max_wait_ms, window_ms) / 1000
+        self._pending = {}
+        # İstatistikler
+        self.webhooks = 0
+        self.batches = 0
+        self.items = 0
+
+    def add(self, key: str, items: list, context=None):
+        """Göndericinin bekleyen grubuna medya ekle ve pencereyi yeniden kur"""
+        self.webhooks += 1
+        self.items += len(items)
+        if self.window <= 0:
+            self._deliver(key, list(items), context)
+            return
+
+        now = time.monotonic()
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = {"items": [], "context": context, "first_at": now, "handle": None}
+            self._pending[key] = batch
+        else:
+            batch["handle"].cancel()
+            batch["context"] = context
+        batch["items"].extend(items)
+
+        delay = min(self.window, self.max_wait - (now - batch["first_at"]))
+        loop = asyncio.get_running_loop()
+        batch["handle"] = loop.call_later(max(delay, 0), self._flush, key)
+
+    def flush(self, key: str):
+        """Göndericinin bekleyen grubunu pencereyi beklemeden teslim et"""
+        batch = self._pending.get(key)
+        if batch is not None:
+            batch["handle"].cancel()
+            self._flush(key)
+
+    def flush_all(self):
+        """Tüm bekleyen grupları teslim et (kapanışta kullanılır)"""
+        for key in list(self._pending):
+            self.flush(key)
+
+    def _flush(self, key):
+        batch = self._pending.pop(key, None)
+        if batch is not None:
+            self._deliver(key, batch["items"], batch["context"])
+
+    def _deliver(self, key, items, context):
+        self.batches += 1
+        try:
+            self.on_flush(key, items, context)
+        except Exception as e:
+            print(f"Medya grubu teslim hatası ({key}): {str(e)}")
+            print(f"Hata detayı: {type(e).__name__}")
+
+    def stats(self) -> dict:
+        return {
+            "window_ms": int(self.window * 1000),
+            "pending_senders": len(self._pending),
+            "webhooks": self.webhooks,
+            "batches": self.batches,
+            "items": self.items,
+        }
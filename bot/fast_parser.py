@@ -0,0 +1,157 @@
+# bot/fast_parser.py
+
+import os
+import re
+
+# Bu güvenin altındaki alanlar için GPT'ye gidilir
+FAST_PATH_THRESHOLD = float(os.getenv("FAST_PATH_THRESHOLD", 0.8))
+# Hızlı yolun tek başına yeterli sayılması için güvenilir olması gereken alanlar
+REQUIRED_FIELDS = ("konum", "oda_sayisi", "metrekare", "fiyat")
+
+_LETTER = "A-Za-zÇĞİÖŞÜçğıöşüÂâÎîÛû"
+_WORD = rf"[{_LETTER}0-9'’.]+"
+
+ODA_RE = re.compile(r"(?<![\d.,])(\d{1,2})\s*\+\s*(\d)(?!\d)")
+STUDYO_RE = re.compile(r"\bst[üu]dyo\b", re.IGNORECASE)
+METREKARE_RE = re.compile(
+    r"(\d{2,4}(?:[.,]\d{1,2})?)\s*(?:m²|m2|mt2|mt²|metrekare|metre\s*kare|m\s*kare|\bm\b)",
+    re.IGNORECASE
+)
+FIYAT_RE = re.compile(
+    r"(?:₺\s*)?(\d{1,3}(?:[.\s]\d{3})+|\d+(?:[.,]\d+)?)\s*(milyon|mn|bin|m|k)?\s*(tl|₺|try|lira)\b|"
+    r"₺\s*(\d{1,3}(?:[.\s]\d{3})+|\d+(?:[.,]\d+)?)",
+    re.IGNORECASE
+)
+MAHALLE_RE = re.compile(rf"({_WORD}(?:\s+{_WORD}){{0,2}})\s+(?:mahallesi|mahalle|mah\.?|mh\.?)(?![{_LETTER}])", re.IGNORECASE)
+SOKAK_RE = re.compile(
+    rf"[ \t](sokağı|sokak|sok\.?|sk\.?|caddesi|cadde|cad\.?|cd\.?|bulvarı|blv\.?)(?![{_LETTER}])",
+    re.IGNORECASE
+)
+MAHALLE_WORDS = {"mahallesi", "mahalle", "mah", "mh"}
+LEADING_SYMBOLS_RE = re.compile(r"^[^\w\d]+")
+
+_SOKAK_SUFFIXES = {
+    "sokağı": "Sokak", "sokak": "Sokak", "sok": "Sokak", "sk": "Sokak",
+    "caddesi": "Caddesi", "cadde": "Caddesi", "cad": "Caddesi", "cd": "Caddesi",
+    "bulvarı": "Bulvarı", "blv": "Bulvarı",
+}
+_MULTIPLIERS = {"milyon": 1_000_000, "mn": 1_000_000, "m": 1_000_000, "bin": 1_000, "k": 1_000}
+
+
+def _field(value, confidence):
+    return {"value": value, "confidence": confidence}
+
+
+def _parse_number(text: str) -> float:
+    """Türkçe sayı biçimini (3.500.000 / 3,5) sayıya çevir"""
+    text = text.replace(" ", "")
+    if re.fullmatch(r"\d{1,3}(?:\.\d{3})+", text):
+        return float(text.replace(".", ""))
+    return float(text.replace(",", "."))
+
+
+def _extract_oda(text):
+    matches = {f"{a}+{b}" for a, b in ODA_RE.findall(text)}
+    if len(matches) == 1:
+        return _field(matches.pop(), 0.95)
+    if matches:
+        # Birden fazla farklı oda sayısı geçiyorsa ilkini düşük güvenle al
+        first = ODA_RE.search(text)
+        return _field(f"{first.group(1)}+{first.group(2)}", 0.5)
+    if STUDYO_RE.search(text):
+        return _field("1+0", 0.85)
+    return _field("", 0.0)
+
+
+def _extract_metrekare(text):
+    values = []
+    for match in METREKARE_RE.finditer(text):
+        value = _parse_number(match.group(1))
+        if 10 <= value <= 10000:
+            values.append(value)
+    if not values:
+        return _field("", 0.0)
+    value = values[0]
+    confidence = 0.9 if len(set(values)) == 1 else 0.6
+    return _field(str(int(value)) if value.is_integer() else str(value), confidence)
+
+
+def _extract_fiyat(text):
+    values = []
+    for match in FIYAT_RE.finditer(text):
+        number = match.group(1) or match.group(4)
+        multiplier = _MULTIPLIERS.get((match.group(2) or "").lower(), 1)
+        try:
+            value = _parse_number(number) * multiplier
+        except ValueError:
+            continue
+        if value >= 1000:
+            values.append(value)
+    if not values:
+        return _field(0, 0.0)
+    confidence = 0.9 if len(set(values)) == 1 else 0.5
+    return _field(int(values[0]), confidence)
+
+
+def _extract_konum(lines):
+    for line in lines:
+        match = MAHALLE_RE.search(line)
+        if match:
+            return _field(LEADING_SYMBOLS_RE.sub("", match.group(1)).strip(), 0.9)
+    if not lines:
+        return _field("", 0.0)
+    # Mesajlarda genellikle ilk satır mahalle adıdır
+    first_line = LEADING_SYMBOLS_RE.sub("", lines[0]).strip()
+    if first_line and len(first_line.split()) <= 3 and not re.search(r"\d", first_line):
+        return _field(first_line, 0.8)
+    return _field(first_line, 0.3)
+
+
+def _extract_sokak(lines):
+    for line in lines:
+        match = SOKAK_RE.search(line)
+        if not match:
+            continue
+        # Sokak adı, ekin hemen önündeki en fazla iki kelimedir
+        words = []
+        for word in reversed(line[:match.start()].split()):
+            cleaned = LEADING_SYMBOLS_RE.sub("", word).strip(",;:")
+            if not cleaned or cleaned.lower().rstrip(".") in MAHALLE_WORDS or word.endswith(","):
+                break
+            if re.search(r"\d", cleaned) and (words or not cleaned.isdigit()):
+                break
+            words.insert(0, cleaned)
+            if len(words) == 2 or cleaned.isdigit():
+                break
+        if not words:
+            continue
+        suffix = _SOKAK_SUFFIXES.get(match.group(1).lower().rstrip("."), match.group(1))
+        return _field(f"{' '.join(words)} {suffix}", 0.85)
+    return _field("", 0.0)
+
+
+def extract_listing(message: str) -> dict:
+    """Mesajdan ilan alanlarını kurallarla çıkar.
+
+    Her alan için {"value": ..., "confidence": 0-1} döndürür.
+    """
+    lines = [line.strip() for line in message.strip().splitlines() if line.strip()]
+    return {
+        "baslik": _field(LEADING_SYMBOLS_RE.sub("", lines[0]).strip() if lines else "", 0.5),
+        "aciklama": _field(message.strip(), 0.5),
+        "fiyat": _extract_fiyat(message),
+        "konum": _extract_konum(lines),
+        "sokak": _extract_sokak(lines),
+        "oda_sayisi": _extract_oda(message),
+        "metrekare": _extract_metrekare(message),
+    }
+
+
+def low_confidence_fields(fields: dict, threshold: float = FAST_PATH_THRESHOLD) -> list:
+    """Zorunlu alanlardan güveni eşiğin altında kalanlar"""
+    return [name for name in REQUIRED_FIELDS if fields[name]["confidence"] < threshold]
+
+
+def to_result(fields: dict) -> dict:
+    """Alan/güven sözlüğünü parse_message_to_json çıktısı biçimine çevir"""
+    return {name: field["value"] for name, field in fields.items()}
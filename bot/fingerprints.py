@@ -0,0 +1,101 @@
+# bot/fingerprints.py
+
+import os
+import sqlite3
+import threading
+import time
+
+from bot.metrics import metrics
+from bot.state_store import STATE_STORE_PATH
+
+# Aynı fotoğrafın tekrar yüklenmesini engelle
+PHOTO_DEDUP = os.getenv("PHOTO_DEDUP", "true").lower() in ("1", "true", "yes")
+# Aynı ilandaki iki fotoğrafın "neredeyse aynı" sayılacağı en fazla dHash farkı (bit)
+PHOTO_DEDUP_DISTANCE = int(os.getenv("PHOTO_DEDUP_DISTANCE", 4))
+# Başka ilanda birebir aynısı bulunan fotoğraf: copy (Drive'da sunucu tarafı kopya),
+# shortcut (kısayol; kaynak ilan silinirse kırılır) veya off (normal yükle)
+PHOTO_DEDUP_CROSS_LISTING = os.getenv("PHOTO_DEDUP_CROSS_LISTING", "copy")
+PHOTO_FINGERPRINT_PATH = os.getenv("PHOTO_FINGERPRINT_PATH", STATE_STORE_PATH)
+
+DEDUP_HITS = metrics.counter("bot_photo_dedup_total", "Tekrar yüklenmeyen fotoğraflar (türe göre)")
+
+
+def hamming(a: str, b: str) -> int:
+    return (int(a, 16) ^ int(b, 16)).bit_count()
+
+
+class FingerprintIndex:
+    """Yüklenen fotoğrafların içerik özetleri.
+
+    md5: indirilen ham verinin özeti, drive_md5: Drive'a yüklenen verinin
+    özeti (Drive'ın md5Checksum alanıyla aynı), dhash: algısal özet.
+    """
+
+    def __init__(self, path: str = PHOTO_FINGERPRINT_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._ready = False
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if not self._ready:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS photo_fingerprints ("
+                    "file_id TEXT PRIMARY KEY, folder_id TEXT NOT NULL, md5 TEXT NOT NULL, "
+                    "drive_md5 TEXT, dhash TEXT, size INTEGER, created_at REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS ix_photo_fingerprints_md5 ON photo_fingerprints (md5)")
+                conn.execute("CREATE INDEX IF NOT EXISTS ix_photo_fingerprints_drive_md5 ON photo_fingerprints (drive_md5)")
+                conn.execute("CREATE INDEX IF NOT EXISTS ix_photo_fingerprints_folder ON photo_fingerprints (folder_id)")
+                self._ready = True
+            self._local.conn = conn
+        return conn
+
+    def add(self, file_id: str, folder_id: str, md5: str, drive_md5: str = None, dhash: str = None, size: int = None):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO photo_fingerprints (file_id, folder_id, md5, drive_md5, dhash, size, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (file_id, folder_id, md5, drive_md5, dhash, size, time.time())
+        )
+
+    def find_exact(self, md5: str, folder_id: str = None):
+        """Aynı içerikli fotoğraf kaydı; folder_id verilirse önce o klasördeki aranır"""
+        rows = self._connect().execute(
+            "SELECT file_id, folder_id FROM photo_fingerprints WHERE md5 = ? OR drive_md5 = ? "
+            "ORDER BY created_at DESC",
+            (md5, md5)
+        ).fetchall()
+        for file_id, row_folder in rows:
+            if row_folder == folder_id:
+                return {"file_id": file_id, "folder_id": row_folder}
+        if rows:
+            return {"file_id": rows[0][0], "folder_id": rows[0][1]}
+        return None
+
+    def find_similar(self, dhash: str, folder_id: str, max_distance: int = PHOTO_DEDUP_DISTANCE):
+        """Aynı klasörde algısal olarak neredeyse aynı fotoğraf"""
+        rows = self._connect().execute(
+            "SELECT file_id, dhash FROM photo_fingerprints WHERE folder_id = ? AND dhash IS NOT NULL",
+            (folder_id,)
+        ).fetchall()
+        for file_id, other in rows:
+            if hamming(dhash, other) <= max_distance:
+                return {"file_id": file_id, "folder_id": folder_id}
+        return None
+
+    def remove_file(self, file_id: str):
+        self._connect().execute("DELETE FROM photo_fingerprints WHERE file_id = ?", (file_id,))
+
+    def remove_folder(self, folder_id: str):
+        """Silinen ilan klasörünün kayıtlarını temizle"""
+        self._connect().execute("DELETE FROM photo_fingerprints WHERE folder_id = ?", (folder_id,))
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM photo_fingerprints").fetchone()[0]
+
+
+fingerprints = FingerprintIndex()
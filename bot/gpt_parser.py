@@ -1,68 +1,252 @@
 # bot/gpt_parser.py
 
-import openai
+import asyncio
 import os
+import random
 from dotenv import load_dotenv
+import hashlib
 import json
+from bot.metrics import metrics, timed
+from bot.parse_cache import ParseCache
+from bot.fast_parser import extract_listing, low_confidence_fields, to_result, FAST_PATH_THRESHOLD, LEADING_SYMBOLS_RE
 
 load_dotenv()
 
-client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-# Örnek prompt fonksiyonu
-def parse_message_to_json(message: str) -> dict:
-    prompt = f"""
-Aşağıdaki emlak mesajını analiz et ve yapılandırılmış bir JSON nesnesi olarak döndür:
-
-Mesaj: "{message}"
-
-Format:
-{{
-  "baslik": "...",
-  "aciklama": "...",
-  "fiyat": 0,
-  "emlak_ofisi_id": 1,
-  "konum": "...",  # Mahalle adı
-  "sokak": "...",  # Sokak/Cadde adı
-  "oda_sayisi": "...",  # 1+1, 2+1, 3+1 gibi
-  "metrekare": "...",  # Varsa metrekare bilgisi
-  "fotolar": []
-}}
-
-Notlar:
-- "emlak_ofisi_id" alanını her zaman 1 olarak ayarla.
-- "fiyat" TL cinsindedir, sadece sayı olarak yaz.
-- "konum" alanına sadece mahalle adını yaz.
-- "sokak" alanına sadece sokak/cadde adını yaz.
-- "oda_sayisi" alanına sadece oda sayısını yaz (örn: "2+1").
-- "metrekare" alanına varsa metrekare bilgisini yaz.
-- JSON dışında hiçbir şey yazma.
-- Eğer mesajda birden fazla satır varsa, genellikle ilk satır mahalle bilgisidir. Başındaki emoji veya işareti temizle.
-"""
-
-    response = client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.2
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+# Aynı anda yapılabilecek en fazla GPT çağrısı
+OPENAI_CONCURRENCY = int(os.getenv("OPENAI_CONCURRENCY", 4))
+# Bir mesaj için toplam süre bütçesi (sıra bekleme ve denemeler dahil); aşılırsa
+# kurallı çözümleyicinin sonucu kullanılır. Webhook yanıtı bu çözümlemeyi bekler ve
+# Twilio 15 saniyede vazgeçer, bu yüzden bütçe bunun epey altında tutulmalıdır.
+OPENAI_BUDGET_SECONDS = float(os.getenv("OPENAI_BUDGET_SECONDS", 8))
+# Tek bir çağrının zaman aşımı (saniye); bütçeden büyük olamaz
+OPENAI_TIMEOUT = min(float(os.getenv("OPENAI_TIMEOUT", 6)), OPENAI_BUDGET_SECONDS)
+# 429 / 5xx / bağlantı hatalarında tekrar deneme (bütçe içinde kaldıkça)
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", 2))
+OPENAI_RETRY_BACKOFF = float(os.getenv("OPENAI_RETRY_BACKOFF", 0.5))
+
+# İlk kullanımda oluşturulur
+client = None
+_semaphore = None
+
+# Yanıtta üst sınır; şemadaki beş alan için yeterli
+OPENAI_MAX_TOKENS = int(os.getenv("OPENAI_MAX_TOKENS", 150))
+# json_schema (yapılandırılmış çıktı destekleyen modeller) veya json_object; boşsa modele göre seçilir
+OPENAI_RESPONSE_FORMAT = os.getenv("OPENAI_RESPONSE_FORMAT", "")
+_STRUCTURED_OUTPUT_MODELS = ("gpt-4o", "gpt-4.1", "gpt-5", "o1", "o3", "o4")
+
+# Sabit kısım system mesajında durur; kullanıcı mesajı sadece ilan metnidir.
+# baslik ve aciklama modelden istenmez (aciklama mesajın kendisi, baslik
+# kayıt sırasında mahalle/sokak/oda sayısından üretilir).
+SYSTEM_PROMPT = (
+    "Türkçe emlak ilanından alanları çıkar, sadece JSON döndür. "
+    "konum: sadece mahalle adı (genellikle ilk satır, emoji olmadan). "
+    "sokak: sadece sokak/cadde adı. oda_sayisi: \"2+1\" biçiminde. "
+    "metrekare ve fiyat (TL): sadece sayı, yoksa null. Bulunmayan metin alanları \"\"."
+)
+
+RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "konum": {"type": "string"},
+        "sokak": {"type": "string"},
+        "oda_sayisi": {"type": "string"},
+        "metrekare": {"type": ["number", "null"]},
+        "fiyat": {"type": ["number", "null"]},
+    },
+    "required": ["konum", "sokak", "oda_sayisi", "metrekare", "fiyat"],
+    "additionalProperties": False,
+}
+
+def _response_format() -> dict:
+    mode = OPENAI_RESPONSE_FORMAT or (
+        "json_schema" if OPENAI_MODEL.startswith(_STRUCTURED_OUTPUT_MODELS) else "json_object"
     )
+    if mode == "json_schema":
+        return {"type": "json_schema", "json_schema": {"name": "ilan", "strict": True, "schema": RESPONSE_SCHEMA}}
+    return {"type": "json_object"}
+
+# Prompt, şema veya model değişince önbellek anahtarları da değişir
+PROMPT_VERSION = hashlib.sha256(
+    f"{OPENAI_MODEL}\n{SYSTEM_PROMPT}\n{json.dumps(_response_format(), sort_keys=True)}".encode("utf-8")
+).hexdigest()[:12]
+
+parse_cache = ParseCache(PROMPT_VERSION)
+
+FAST_PATH_HITS = metrics.counter("bot_parser_fast_path_total", "GPT'ye gitmeden kurallarla çözümlenen mesajlar")
+GPT_CALLS = metrics.counter("bot_parser_gpt_calls_total", "GPT'ye gönderilen mesajlar")
+GPT_RETRIES = metrics.counter("bot_parser_gpt_retries_total", "Tekrar denenen GPT çağrıları")
+GPT_FALLBACKS = metrics.counter("bot_parser_gpt_fallback_total", "GPT başarısız olduğu için kurallı sonuca düşülen mesajlar")
+GPT_REPAIRS = metrics.counter("bot_parser_gpt_repairs_total", "Geçersiz JSON için yapılan onarım çağrıları (sonuca göre)")
+OPENAI_TOKENS = metrics.counter("bot_openai_tokens_total", "OpenAI token kullanımı (tür ve modele göre)")
+OPENAI_TOKENS_PER_CALL = metrics.histogram(
+    "bot_openai_tokens_per_call", "Çağrı başına OpenAI token sayısı (türe göre)",
+    buckets=(50, 100, 200, 300, 500, 750, 1000, 2000)
+)
+
+def get_client():
+    """Ortak async OpenAI istemcisini döndür"""
+    global client
+    if client is None:
+        # openai paketi ağır; ilk GPT çağrısında yüklenir
+        import openai
+
+        # Tekrar denemeleri burada, jitter ile biz yapıyoruz
+        client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=OPENAI_TIMEOUT, max_retries=0)
+    return client
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(OPENAI_CONCURRENCY)
+    return _semaphore
+
+def is_retryable(error: Exception) -> bool:
+    """429, 5xx, zaman aşımı ve bağlantı hataları tekrar denenir"""
+    import openai
+
+    if isinstance(error, (openai.APIConnectionError, asyncio.TimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
 
-    json_str = response.choices[0].message.content
-
-    # JSON metnini Python dict'e dönüştür
-    try:
-        result = json.loads(json_str)
-        # Eğer mahalle (konum) boşsa, ilk satırı kullan
-        if not result.get('konum'):
-            first_line = message.strip().split('\n')[0]
-            # Başındaki emoji ve işaretleri temizle
-            import re
-            first_line = re.sub(r'^[^\w\d]+', '', first_line).strip()
-            result['konum'] = first_line
-        # Anahtar uyumluluğu: 'mahalle' anahtarını da ekle
+
+async def parse_message_to_json(message: str, fallback: bool = True) -> dict:
+    """İlan mesajını çözümle; kurallar yeterince eminse GPT'ye gitme.
+
+    GPT süre bütçesini aşarsa veya hata verirse kurallı sonuç döner;
+    fallback=False ise hata yükseltilir.
+    """
+    fields = extract_listing(message)
+    if not low_confidence_fields(fields):
+        FAST_PATH_HITS.inc()
+        result = to_result(fields)
         result['mahalle'] = result.get('konum', '')
         return result
-    except Exception as e:
-        print("GPT çıktısı parse edilemedi:", e)
+
+    result = parse_cache.get(message)
+    if result is None:
+        GPT_CALLS.inc()
+        try:
+            result = await asyncio.wait_for(parse_with_gpt(message), timeout=OPENAI_BUDGET_SECONDS)
+        except Exception as e:
+            if not fallback:
+                raise
+            print(f"GPT çağrısı başarısız, kurallı sonuç kullanılıyor: {type(e).__name__}: {str(e)}")
+            GPT_FALLBACKS.inc()
+            return _fallback_result(fields)
+        parse_cache.set(message, result)
+    result = _complete_result(result, message)
+    # Kurallarla güvenle bulunan alanlar GPT çıktısının önüne geçer
+    for name, field in fields.items():
+        if field["confidence"] >= FAST_PATH_THRESHOLD:
+            result[name] = field["value"]
+    result['mahalle'] = result.get('konum', '')
+    return result
+
+def _fallback_result(fields: dict) -> dict:
+    """GPT'ye ulaşılamadığında kurallı çözümleyicinin sonucunu kullan"""
+    if not fields["konum"]["value"]:
         return {}
+    result = to_result(fields)
+    result['mahalle'] = result.get('konum', '')
+    return result
+
+def parser_stats() -> dict:
+    """Hızlı yol / GPT çağrı oranı"""
+    fast = FAST_PATH_HITS.value()
+    gpt = GPT_CALLS.value()
+    total = fast + gpt
+    return {
+        "fast_path": fast,
+        "gpt_calls": gpt,
+        "fast_path_ratio": round(fast / total, 4) if total else 0.0,
+        "gpt_retries": GPT_RETRIES.value(),
+        "gpt_fallbacks": GPT_FALLBACKS.value(),
+        "gpt_repairs": GPT_REPAIRS.value(result="ok") + GPT_REPAIRS.value(result="failed"),
+        "prompt_tokens": OPENAI_TOKENS.value(kind="prompt", model=OPENAI_MODEL),
+        "completion_tokens": OPENAI_TOKENS.value(kind="completion", model=OPENAI_MODEL),
+    }
+
+def _record_usage(response):
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    for kind in ("prompt", "completion"):
+        tokens = getattr(usage, f"{kind}_tokens", None) or 0
+        OPENAI_TOKENS.inc(tokens, kind=kind, model=OPENAI_MODEL)
+        OPENAI_TOKENS_PER_CALL.observe(tokens, kind=kind)
+
+async def _complete(messages: list) -> str:
+    """Tek bir completion isteği; 429/5xx hatalarında jitter ile tekrar dener"""
+    for attempt in range(OPENAI_MAX_RETRIES + 1):
+        try:
+            with timed("gpt_parse", "openai"):
+                response = await get_client().chat.completions.create(
+                    model=OPENAI_MODEL,
+                    messages=messages,
+                    temperature=0,
+                    max_tokens=OPENAI_MAX_TOKENS,
+                    response_format=_response_format()
+                )
+            _record_usage(response)
+            return response.choices[0].message.content
+        except Exception as e:
+            if attempt >= OPENAI_MAX_RETRIES or not is_retryable(e):
+                raise
+            GPT_RETRIES.inc()
+            delay = OPENAI_RETRY_BACKOFF * (2 ** attempt)
+            await asyncio.sleep(delay + random.uniform(0, delay))
+
+def _load_result(json_str: str) -> dict:
+    result = json.loads(json_str)
+    if not isinstance(result, dict):
+        raise ValueError("JSON nesnesi bekleniyordu")
+    return result
+
+async def parse_with_gpt(message: str) -> dict:
+    """Mesajı GPT ile çözümle.
+
+    Çıktı JSON olarak okunamazsa hata mesajıyla birlikte bir kez onarım
+    istenir; o da başarısız olursa ValueError fırlatılır.
+    """
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": message.strip()}
+    ]
+
+    async with _get_semaphore():
+        json_str = await _complete(messages)
+        try:
+            result = _load_result(json_str)
+        except ValueError as e:
+            print("GPT çıktısı parse edilemedi, onarım isteniyor:", e)
+            repair_messages = messages + [
+                {"role": "assistant", "content": json_str or ""},
+                {"role": "user", "content": f"Geçersiz JSON ({e}). Sadece şemaya uyan JSON nesnesini döndür."}
+            ]
+            try:
+                result = _load_result(await _complete(repair_messages))
+            except ValueError:
+                GPT_REPAIRS.inc(result="failed")
+                raise
+            GPT_REPAIRS.inc(result="ok")
+
+    return {name: result.get(name) for name in RESPONSE_SCHEMA["properties"]}
+
+def _complete_result(result: dict, message: str) -> dict:
+    """Model çıktısını mesajdan türetilen alanlarla tamamla"""
+    lines = [line for line in message.strip().split('\n') if line.strip()]
+    first_line = LEADING_SYMBOLS_RE.sub('', lines[0]).strip() if lines else ''
+    # Eğer mahalle (konum) boşsa, ilk satırı kullan
+    if not result.get('konum'):
+        result['konum'] = first_line
+    for name in ("sokak", "oda_sayisi"):
+        result[name] = result.get(name) or ''
+    for name in ("fiyat", "metrekare"):
+        if result.get(name) is None:
+            result[name] = ''
+    result['baslik'] = first_line
+    result['aciklama'] = message.strip()
+    return result
@@ -0,0 +1,55 @@
+# bot/idempotency.py
+
+import os
+
+from bot.state_store import STATE_STORE_BACKEND, create_state_store
+
+# Tekrarlanan webhook'ları ayıklamak için ayarlar
+IDEMPOTENCY_BACKEND = os.getenv("IDEMPOTENCY_BACKEND", STATE_STORE_BACKEND)
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", 60 * 60))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", 10000))
+
+PROCESSING = "processing"
+DONE = "done"
+
+
+class IdempotencyCache:
+    """Twilio MessageSid'ine göre işlenmiş mesajları ve yanıtlarını tutar.
+
+    Twilio yavaş yanıtlarda aynı webhook'u tekrar gönderir; bu durumda mesaj
+    tekrar işlenmez, ilk yanıt (işlem sürüyorsa boş yanıt) döndürülür.
+    """
+
+    def __init__(self, store=None):
+        self.store = store or create_state_store(
+            backend=IDEMPOTENCY_BACKEND,
+            table="processed_messages",
+            ttl=IDEMPOTENCY_TTL_SECONDS,
+            max_entries=IDEMPOTENCY_MAX_ENTRIES
+        )
+        self.hits = 0
+        self.misses = 0
+
+    def begin(self, message_sid: str):
+        """Mesajı işlemeye al.
+
+        Mesaj ilk kez geliyorsa None döner; daha önce geldiyse önbellekteki
+        yanıt içeriğini döndürür.
+        """
+        if self.store.add(message_sid, {"status": PROCESSING, "content": ""}):
+            self.misses += 1
+            return None
+        self.hits += 1
+        entry = self.store.get(message_sid) or {}
+        return entry.get("content", "")
+
+    def complete(self, message_sid: str, content: str):
+        """İşlenen mesajın yanıtını kaydet"""
+        self.store.set(message_sid, {"status": DONE, "content": content})
+
+    def release(self, message_sid: str):
+        """Hata durumunda kaydı sil ki Twilio'nun tekrar denemesi işlenebilsin"""
+        self.store.delete(message_sid)
+
+    def stats(self) -> dict:
+        return {"entries": len(self.store), "hits": self.hits, "misses": self.misses}
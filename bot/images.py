@@ -0,0 +1,153 @@
+# bot/images.py
+"""Drive'a yüklemeden önce fotoğrafları küçültüp yeniden kodlama.
+
+Görseller çözülür, EXIF yönüne göre döndürülür, EXIF (konum bilgisi dahil)
+atılır, en uzun kenarı IMAGE_MAX_DIMENSION'a indirilir ve JPEG veya WebP
+olarak yeniden kodlanır; ayrıca küçük bir önizleme (thumbnail) üretilir.
+CPU yoğun kodlama ayrı süreçlerde çalışır, böylece istek işleyen thread'ler
+GIL için beklemez.
+"""
+
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Ön işleme kapatılırsa medya olduğu gibi yüklenir
+IMAGE_PREPROCESS = os.getenv("IMAGE_PREPROCESS", "true").lower() in ("1", "true", "yes")
+IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", 1920))
+# jpeg veya webp
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "jpeg").lower()
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", 82))
+# Önizleme görselinin en uzun kenarı (0 = üretme). Önizlemeler ilan klasöründeki
+# "thumbs" klasörüne ayrı dosya olarak yüklenir ama linkleri hiçbir yerde
+# saklanmaz; fotoğraf başına ek bir yükleme olduğundan varsayılan olarak kapalı
+IMAGE_THUMBNAIL_SIZE = int(os.getenv("IMAGE_THUMBNAIL_SIZE", 0))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", max(1, min(4, os.cpu_count() or 1))))
+
+_FORMATS = {
+    "jpeg": ("JPEG", "image/jpeg", ".jpg"),
+    "webp": ("WEBP", "image/webp", ".webp"),
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def is_image(media_type: str) -> bool:
+    return (media_type or "").split(";")[0].strip().lower().startswith("image/")
+
+
+def _encode(image, fmt: str, quality: int) -> bytes:
+    from PIL import Image
+
+    pil_format = _FORMATS[fmt][0]
+    if pil_format == "JPEG" and image.mode != "RGB":
+        if image.mode in ("RGBA", "LA", "P"):
+            # Saydam alanları beyaz zemine yerleştir
+            rgba = image.convert("RGBA")
+            background = Image.new("RGB", rgba.size, (255, 255, 255))
+            background.paste(rgba, mask=rgba.getchannel("A"))
+            image = background
+        else:
+            image = image.convert("RGB")
+    elif pil_format == "WEBP" and image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() or image.mode == "P" else "RGB")
+
+    buffer = io.BytesIO()
+    options = {"quality": quality}
+    if pil_format == "JPEG":
+        options.update(optimize=True, progressive=True)
+    else:
+        options.update(method=4)
+    # exif parametresi verilmediği için EXIF (GPS dahil) yazılmaz
+    image.save(buffer, format=pil_format, **options)
+    return buffer.getvalue()
+
+
+def dhash(image, size: int = 8) -> str:
+    """Görselin fark tabanlı algısal özeti (64 bit, hex)"""
+    from PIL import Image
+
+    small = image.convert("L").resize((size + 1, size), Image.BILINEAR)
+    pixels = small.tobytes()
+    value = 0
+    for row in range(size):
+        for col in range(size):
+            offset = row * (size + 1) + col
+            value = (value << 1) | (pixels[offset] > pixels[offset + 1])
+    return f"{value:0{size * size // 4}x}"
+
+
+def process_image(data: bytes, max_dimension: int = IMAGE_MAX_DIMENSION, fmt: str = IMAGE_FORMAT,
+                  quality: int = IMAGE_QUALITY, thumbnail_size: int = IMAGE_THUMBNAIL_SIZE) -> dict:
+    """Görseli çöz, yönünü düzelt, küçült ve yeniden kodla (alt süreçte çalışır).
+
+    {"data", "mimetype", "ext", "width", "height", "dhash", "thumbnail"} döndürür;
+    thumbnail_size 0 ise "thumbnail" None olur.
+    """
+    from PIL import Image, ImageOps
+
+    image = Image.open(io.BytesIO(data))
+    if image.format == "JPEG" and max_dimension:
+        # JPEG'i doğrudan küçük ölçekte çöz (çok daha hızlı)
+        image.draft("RGB", (max_dimension, max_dimension))
+    image = ImageOps.exif_transpose(image)
+    if max_dimension and max(image.size) > max_dimension:
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+    _, mimetype, ext = _FORMATS[fmt]
+    result = {
+        "data": _encode(image, fmt, quality),
+        "mimetype": mimetype,
+        "ext": ext,
+        "width": image.width,
+        "height": image.height,
+        "dhash": dhash(image),
+        "thumbnail": None,
+    }
+    if thumbnail_size:
+        thumb = image.copy()
+        thumb.thumbnail((thumbnail_size, thumbnail_size), Image.LANCZOS)
+        result["thumbnail"] = _encode(thumb, fmt, min(quality, 75))
+    return result
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # fork, thread'li bir süreçte kilitlenmelere yol açabilir; spawn kullan
+            _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def preprocess_image(data: bytes, media_type: str):
+    """Görseli işlem havuzunda ön işle.
+
+    Görsel değilse, ön işleme kapalıysa veya çözülemezse None döner; bu
+    durumda medya olduğu gibi yüklenmelidir.
+    """
+    if not IMAGE_PREPROCESS or not is_image(media_type):
+        return None
+    try:
+        return _get_pool().submit(process_image, data).result()
+    except BrokenProcessPool as e:
+        # Çöken havuz bir sonraki çağrıda yeniden kurulur
+        print(f"Görsel ön işleme havuzu çöktü: {str(e)}")
+        shutdown()
+        return None
+    except Exception as e:
+        print(f"Görsel ön işleme hatası: {type(e).__name__}: {str(e)}")
+        return None
+
+
+def shutdown():
+    """İşlem havuzunu kapat"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
@@ -0,0 +1,178 @@
+# bot/jobs.py
+
+import asyncio
+import hashlib
+import hmac
+import os
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from bot.metrics import STAGE_DURATION
+
+# Kuyruk ve worker ayarları
+JOB_WORKERS = int(os.getenv("BOT_JOB_WORKERS", 4))
+JOB_QUEUE_SIZE = int(os.getenv("BOT_JOB_QUEUE_SIZE", 100))
+# /tamamla öncesi göndericinin işlerinin bitmesi için beklenecek süre (saniye)
+JOB_JOIN_TIMEOUT = float(os.getenv("BOT_JOB_JOIN_TIMEOUT", 10))
+# İstatistiği tutulacak en fazla gönderici sayısı
+JOB_TRACKED_SENDERS = int(os.getenv("BOT_JOB_TRACKED_SENDERS", 1000))
+# İstatistiklerde gönderici numaraları yerine süreç başına tuzlu özet gösterilir;
+# telefon numaraları tuzsuz özetten kolayca geri bulunabilir
+_STATS_KEY_SALT = os.urandom(16)
+
+
+def stats_key(key) -> str:
+    """Gönderici anahtarını istatistiklerde gösterilecek şekilde gizle"""
+    return hmac.new(_STATS_KEY_SALT, str(key).encode("utf-8"), hashlib.sha256).hexdigest()[:12]
+
+
+class JobQueueFull(Exception):
+    """Kuyruk dolu olduğunda fırlatılır"""
+
+
+class JobQueue:
+    """Webhook'u bloklamadan arka planda iş çalıştıran kuyruk.
+
+    Her göndericinin (anahtarın) kendi posta kutusu vardır: aynı göndericinin
+    işleri sırayla, farklı göndericilerin işleri paralel çalışır. İşler senkron
+    fonksiyonlardır ve thread havuzunda çalıştırılır, böylece Drive/Twilio/
+    veritabanı çağrıları event loop'u bloklamaz.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, max_size: int = JOB_QUEUE_SIZE, name: str = "jobs"):
+        self.workers = workers
+        self.max_size = max_size
+        self.name = name
+        self._executor = None
+        self._slots = None
+        self._mailboxes = {}
+        self._runners = {}
+        self._pending = 0
+        self._sender_stats = OrderedDict()
+        # İstatistikler
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.total_run = 0.0
+        self.max_latency = 0.0
+        self.last_latency = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._executor is not None
+
+    async def start(self):
+        """Thread havuzunu başlat"""
+        if self.running:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+        self._slots = asyncio.Semaphore(self.workers)
+        print(f"İş kuyruğu başlatıldı: {self.workers} worker, kapasite {self.max_size}")
+
+    async def stop(self):
+        """Bekleyen işlerin bitmesini bekle ve thread havuzunu kapat"""
+        if not self.running:
+            return
+        while self._runners:
+            await asyncio.gather(*list(self._runners.values()), return_exceptions=True)
+        self._executor.shutdown(wait=True)
+        self._executor = None
+
+    def submit(self, key: str, func, *args, **kwargs):
+        """İşi göndericinin posta kutusuna ekle, kuyruk doluysa JobQueueFull fırlat"""
+        if not self.running:
+            raise RuntimeError("İş kuyruğu başlatılmadı")
+        if self._pending >= self.max_size:
+            self.rejected += 1
+            raise JobQueueFull(f"İş kuyruğu dolu ({self.max_size})")
+        mailbox = self._mailboxes.setdefault(key, deque())
+        mailbox.append((time.monotonic(), func, args, kwargs))
+        self._pending += 1
+        self.submitted += 1
+        if key not in self._runners:
+            self._runners[key] = asyncio.create_task(self._drain(key))
+
+    async def join(self, key: str, timeout: float = None):
+        """Göndericinin bekleyen tüm işleri bitene kadar bekle"""
+        runner = self._runners.get(key)
+        if runner is None:
+            return True
+        try:
+            await asyncio.wait_for(asyncio.shield(runner), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def pending(self, key: str) -> int:
+        """Göndericinin bekleyen iş sayısı"""
+        return len(self._mailboxes.get(key, ()))
+
+    async def _drain(self, key):
+        loop = asyncio.get_running_loop()
+        mailbox = self._mailboxes[key]
+        try:
+            while mailbox:
+                enqueued_at, func, args, kwargs = mailbox.popleft()
+                async with self._slots:
+                    started_at = time.monotonic()
+                    try:
+                        await loop.run_in_executor(self._executor, lambda: func(*args, **kwargs))
+                        self.completed += 1
+                    except Exception as e:
+                        self.failed += 1
+                        print(f"Arka plan iş hatası ({getattr(func, '__name__', func)}): {str(e)}")
+                        print(f"Hata detayı: {type(e).__name__}")
+                    finally:
+                        self._pending -= 1
+                        self._record(key, enqueued_at, started_at, time.monotonic())
+        finally:
+            # Posta kutusu boşaldı, göndericiyi aktif listeden çıkar
+            del self._mailboxes[key]
+            del self._runners[key]
+
+    def _record(self, key, enqueued_at, started_at, finished_at):
+        wait = started_at - enqueued_at
+        latency = finished_at - enqueued_at
+        self.total_wait += wait
+        self.total_run += finished_at - started_at
+        self.last_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+        STAGE_DURATION.observe(wait, stage=f"{self.name}_queue_wait")
+
+        sender = self._sender_stats.pop(key, None) or {"processed": 0, "total_wait": 0.0, "max_wait": 0.0}
+        sender["processed"] += 1
+        sender["total_wait"] += wait
+        sender["max_wait"] = max(sender["max_wait"], wait)
+        self._sender_stats[key] = sender
+        while len(self._sender_stats) > JOB_TRACKED_SENDERS:
+            self._sender_stats.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Kuyruk derinliği, worker sayısı ve gecikme istatistikleri"""
+        done = self.completed + self.failed
+        return {
+            "workers": self.workers,
+            "max_size": self.max_size,
+            "depth": self._pending,
+            "active_senders": len(self._runners),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_wait_seconds": round(self.total_wait / done, 4) if done else 0.0,
+            "avg_run_seconds": round(self.total_run / done, 4) if done else 0.0,
+            "last_latency_seconds": round(self.last_latency, 4),
+            "max_latency_seconds": round(self.max_latency, 4),
+            "queue_lengths": {stats_key(key): len(mailbox) for key, mailbox in self._mailboxes.items()},
+            "senders": {
+                stats_key(key): {
+                    "processed": sender["processed"],
+                    "avg_wait_seconds": round(sender["total_wait"] / sender["processed"], 4),
+                    "max_wait_seconds": round(sender["max_wait"], 4),
+                }
+                for key, sender in self._sender_stats.items()
+            },
+        }
@@ -0,0 +1,36 @@
+# bot/listing.py
+
+from backend.schemas.ilan import IlanCreate
+
+
+def generate_ilan_baslik(mahalle, sokak, oda_sayisi):
+    mahalle = ''.join(c for c in mahalle if c.isalnum() or c.isspace())
+    sokak = ''.join(c for c in sokak if c.isalnum() or c.isspace())
+    return f"{mahalle}-{sokak}-{oda_sayisi}"
+
+
+def _to_float(value):
+    try:
+        return float(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def ilan_from_details(ilan_details: dict, drive_link: str = None, drive_folder_id: str = None,
+                      photo_count: int = 0) -> IlanCreate:
+    """Çözümlenmiş ilan detaylarından IlanCreate nesnesi oluştur"""
+    mahalle = ilan_details.get("mahalle", "") or ""
+    sokak = ilan_details.get("sokak", "") or ""
+    oda_sayisi = ilan_details.get("oda_sayisi", "") or ""
+    return IlanCreate(
+        baslik=generate_ilan_baslik(mahalle, sokak, oda_sayisi),
+        aciklama=ilan_details.get("aciklama", "") or "",
+        fiyat=_to_float(ilan_details.get("fiyat", "")),
+        mahalle=mahalle,
+        sokak=sokak,
+        oda_sayisi=oda_sayisi,
+        metrekare=_to_float(ilan_details.get("metrekare", "")),
+        drive_link=drive_link,
+        drive_folder_id=drive_folder_id,
+        photo_count=photo_count
+    )
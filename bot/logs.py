@@ -0,0 +1,28 @@
+# bot/logs.py
+
+import json
+import logging
+import os
+import random
+
+# Sık tekrarlanan olay loglarının ne kadarının yazılacağı (0-1 arası)
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", 0.1))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+logger = logging.getLogger("bot")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+
+
+def log_event(event: str, sample_rate: float = None, level: int = logging.INFO, **fields):
+    """Olayı tek satırlık JSON olarak, örnekleme oranına göre logla"""
+    rate = LOG_SAMPLE_RATE if sample_rate is None else sample_rate
+    if rate < 1 and random.random() >= rate:
+        return
+    if not logger.isEnabledFor(level):
+        return
+    logger.log(level, json.dumps({"event": event, **fields}, ensure_ascii=False, default=str))
@@ -0,0 +1,183 @@
+# bot/media.py
+
+import hashlib
+import io
+import mimetypes
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from bot.fingerprints import fingerprints, DEDUP_HITS, PHOTO_DEDUP, PHOTO_DEDUP_CROSS_LISTING
+from bot.images import preprocess_image, IMAGE_PREPROCESS, IMAGE_THUMBNAIL_SIZE
+from bot.metrics import timed
+from drive_service.storage import get_storage
+
+# Aynı anda indirilecek/yüklenecek en fazla medya sayısı
+MEDIA_CONCURRENCY = int(os.getenv("MEDIA_CONCURRENCY", 4))
+MEDIA_DOWNLOAD_TIMEOUT = float(os.getenv("MEDIA_DOWNLOAD_TIMEOUT", 30))
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Önizleme görsellerinin ilan klasörü altında yükleneceği klasör
+THUMBNAIL_FOLDER_NAME = "thumbs"
+
+_http = None
+_executor = ThreadPoolExecutor(max_workers=MEDIA_CONCURRENCY, thread_name_prefix="media")
+# (klasör, md5) -> [kilit, kullanan sayısı]; aynı albümdeki aynı fotoğrafın
+# kopyaları paralel işlenirken ikisinin birden yüklenmesini önler
+_dedup_locks = {}
+_dedup_locks_guard = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """Bağlantıları yeniden kullanan ortak HTTP oturumunu döndür"""
+    global _http
+    if _http is None:
+        session = requests.Session()
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=("GET",))
+        adapter = HTTPAdapter(pool_connections=MEDIA_CONCURRENCY, pool_maxsize=MEDIA_CONCURRENCY, max_retries=retry)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _http = session
+    return _http
+
+
+def download_media(media_url: str, auth=None):
+    """Medyayı parça parça belleğe indir, (veri, içerik tipi) döndür"""
+    with timed("media_download", "twilio_media"):
+        with get_http_session().get(media_url, auth=auth, stream=True, timeout=MEDIA_DOWNLOAD_TIMEOUT) as response:
+            response.raise_for_status()
+            buffer = io.BytesIO()
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                buffer.write(chunk)
+            return buffer.getvalue(), response.headers.get("Content-Type")
+
+
+def media_filename(index: int, media_type: str) -> str:
+    """İçerik tipine göre dosya adı üret"""
+    ext = mimetypes.guess_extension((media_type or "").split(";")[0].strip()) or ".jpg"
+    if ext == ".jpe":
+        ext = ".jpg"
+    return f"photo_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{index}{ext}"
+
+
+@contextmanager
+def dedup_lock(folder_id: str, md5: str):
+    """Aynı klasöre aynı içeriğin kontrol-yükle-kaydet adımlarını sıraya sok"""
+    key = (folder_id, md5)
+    with _dedup_locks_guard:
+        entry = _dedup_locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _dedup_locks_guard:
+            entry[1] -= 1
+            if not entry[1]:
+                del _dedup_locks[key]
+
+
+def reuse_existing(storage, md5: str, folder_id: str, filename: str):
+    """Aynı içerik daha önce yüklendiyse tekrar yüklemeden çöz.
+
+    (atla, dosya ID'si) döndürür: aynı ilandaki kopya atlanır, başka ilandaki
+    kopya PHOTO_DEDUP_CROSS_LISTING'e göre depolama içinde kopyalanır veya
+    kısayolu oluşturulur. Eşleşme yoksa (False, None) döner.
+    """
+    hit = fingerprints.find_exact(md5, folder_id)
+    if not hit:
+        return False, None
+    if hit["folder_id"] == folder_id:
+        DEDUP_HITS.inc(kind="exact")
+        return True, None
+    if PHOTO_DEDUP_CROSS_LISTING not in ("copy", "shortcut"):
+        return False, None
+    try:
+        if PHOTO_DEDUP_CROSS_LISTING == "copy":
+            file_id = storage.copy_file(hit["file_id"], folder_id, filename)
+        else:
+            file_id = storage.create_shortcut(hit["file_id"], folder_id, filename)
+    except Exception as e:
+        # Kaynak dosya silinmiş olabilir; kaydı düşür ve normal yükle
+        print(f"Fotoğraf kopyalanamadı ({hit['file_id']}): {str(e)}")
+        fingerprints.remove_file(hit["file_id"])
+        return False, None
+    DEDUP_HITS.inc(kind=PHOTO_DEDUP_CROSS_LISTING)
+    return True, file_id
+
+
+def transfer_one(index: int, media_url: str, media_type: str, folder_id: str, auth=None, thumbs_folder_id=None):
+    """Tek bir medyayı indirip ön işle ve depolamaya yükle, dosya ID'sini döndür.
+
+    PHOTO_DEDUP açıksa aynı ilana tekrar gönderilen (birebir veya algısal
+    olarak neredeyse aynı) fotoğraflar yüklenmez ve None döner.
+    """
+    data, content_type = download_media(media_url, auth=auth)
+    media_type = media_type or content_type
+    storage = get_storage()
+    md5 = hashlib.md5(data).hexdigest()
+    size = len(data)
+    # Aynı albümdeki kopya, ilki yüklenip kaydedilene kadar bekler ve sonra atlanır
+    with dedup_lock(folder_id, md5) if PHOTO_DEDUP else nullcontext():
+        if PHOTO_DEDUP:
+            skip, file_id = reuse_existing(storage, md5, folder_id, media_filename(index, media_type))
+            if skip:
+                if file_id:
+                    fingerprints.add(file_id, folder_id, md5, size=size)
+                return file_id
+
+        with timed("image_preprocess"):
+            processed = preprocess_image(data, media_type)
+        dhash = None
+        if processed:
+            data, media_type, dhash = processed["data"], processed["mimetype"], processed["dhash"]
+            if PHOTO_DEDUP and fingerprints.find_similar(dhash, folder_id):
+                DEDUP_HITS.inc(kind="similar")
+                return None
+        filename = media_filename(index, media_type)
+        file_id = storage.upload_bytes(data, filename, media_type, folder_id)
+        if PHOTO_DEDUP:
+            fingerprints.add(file_id, folder_id, md5, drive_md5=hashlib.md5(data).hexdigest(), dhash=dhash, size=size)
+    if processed and processed["thumbnail"] and thumbs_folder_id:
+        try:
+            storage.upload_bytes(processed["thumbnail"], filename, media_type, thumbs_folder_id)
+        except Exception as e:
+            print(f"Önizleme yükleme hatası ({index}): {str(e)}")
+    return file_id
+
+
+def transfer_media_to_drive(media_items: list, folder_id: str, auth=None, public_folder: bool = False) -> list:
+    """Mesajdaki tüm medyaları eşzamanlı aktar ve paylaşımlarını ayarla.
+
+    public_folder=True ise klasör herkese açık oluşturulmuştur; dosyalar
+    paylaşımı klasörden devralır ve ayrıca izin isteği atılmaz.
+
+    Önizlemeler ilan klasöründeki "thumbs" klasörüne aynı dosya adıyla
+    yüklenir. Sonuç listesi media_items ile aynı sıradadır, başarısız olanlar
+    ve tekrar olduğu için atlananlar için None döner.
+    """
+    thumbs_folder_id = None
+    if IMAGE_PREPROCESS and IMAGE_THUMBNAIL_SIZE:
+        try:
+            thumbs_folder_id = get_storage().get_or_create_folder(THUMBNAIL_FOLDER_NAME, folder_id)
+        except Exception as e:
+            print(f"Önizleme klasörü oluşturulamadı: {str(e)}")
+    futures = [
+        _executor.submit(transfer_one, i, media_url, media_type, folder_id, auth, thumbs_folder_id)
+        for i, (media_url, media_type) in enumerate(media_items)
+    ]
+    file_ids = []
+    for i, future in enumerate(futures):
+        try:
+            file_ids.append(future.result())
+        except Exception as e:
+            print(f"Fotoğraf aktarma hatası ({i}): {str(e)}")
+            print(f"Hata detayı: {type(e).__name__}")
+            file_ids.append(None)
+    # Paylaşım izinleri (Drive'da DRIVE_SHARING_MODE) tüm dosyalar için tek seferde ayarlanır
+    return get_storage().share(file_ids, inherit=public_folder)
@@ -0,0 +1,159 @@
+# bot/outbound.py
+
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Twilio gönderim ayarları (gönderen numara başına hız limiti)
+OUTBOUND_RATE_PER_SECOND = float(os.getenv("OUTBOUND_RATE_PER_SECOND", 10))
+OUTBOUND_BURST = int(os.getenv("OUTBOUND_BURST", 10))
+OUTBOUND_CONCURRENCY = int(os.getenv("OUTBOUND_CONCURRENCY", 4))
+OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", 3))
+OUTBOUND_RETRY_BACKOFF = float(os.getenv("OUTBOUND_RETRY_BACKOFF", 1.0))
+
+
+class TokenBucket:
+    """Basit token bucket hız sınırlayıcı"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def is_retryable(error: Exception) -> bool:
+    """429 ve 5xx hataları ile bağlantı hataları tekrar denenir"""
+    status = getattr(error, "status", None)
+    if status is None:
+        return True
+    return status == 429 or status >= 500
+
+
+class OutboundDispatcher:
+    """Giden WhatsApp mesajlarını kuyruktan hız limitiyle gönderir.
+
+    Her alıcının mesajları sırayla gönderilir. Aynı coalesce_key ile kuyruğa
+    eklenen ve henüz gönderilmemiş mesajın içeriği yenisiyle değiştirilir
+    (ör. art arda gelen "Toplam X fotoğraf yüklendi" mesajlarından sadece
+    sonuncusu gider).
+    """
+
+    def __init__(self, send_func, rate: float = OUTBOUND_RATE_PER_SECOND, burst: int = OUTBOUND_BURST,
+                 concurrency: int = OUTBOUND_CONCURRENCY, max_retries: int = OUTBOUND_MAX_RETRIES,
+                 retry_backoff: float = OUTBOUND_RETRY_BACKOFF):
+        self.send_func = send_func
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._loop = None
+        self._executor = None
+        self._bucket = None
+        self._outboxes = {}
+        self._runners = {}
+        # İstatistikler
+        self.queued = 0
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.coalesced = 0
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None
+
+    async def start(self):
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="outbound")
+        self._bucket = TokenBucket(self.rate, self.burst)
+
+    async def stop(self):
+        """Kuyruktaki mesajlar gönderildikten sonra durdur"""
+        if not self.running:
+            return
+        # Diğer thread'lerden eklenen mesajların kuyruğa düşmesini bekle
+        await asyncio.sleep(0)
+        while self._runners:
+            await asyncio.gather(*list(self._runners.values()), return_exceptions=True)
+        self._executor.shutdown(wait=True)
+        self._loop = None
+
+    def send(self, to_number: str, body: str, coalesce_key: str = None):
+        """Mesajı kuyruğa ekle; herhangi bir thread'den çağrılabilir"""
+        try:
+            in_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            in_loop = False
+        if in_loop:
+            self._enqueue(to_number, body, coalesce_key)
+        else:
+            self._loop.call_soon_threadsafe(self._enqueue, to_number, body, coalesce_key)
+
+    def _enqueue(self, to_number, body, coalesce_key):
+        outbox = self._outboxes.setdefault(to_number, deque())
+        if coalesce_key:
+            for message in outbox:
+                if message["key"] == coalesce_key:
+                    message["body"] = body
+                    self.coalesced += 1
+                    return
+        outbox.append({"body": body, "key": coalesce_key})
+        self.queued += 1
+        if to_number not in self._runners:
+            self._runners[to_number] = asyncio.create_task(self._drain(to_number))
+
+    async def _drain(self, to_number):
+        outbox = self._outboxes[to_number]
+        try:
+            while outbox:
+                message = outbox.popleft()
+                await self._deliver(to_number, message["body"])
+        finally:
+            del self._outboxes[to_number]
+            del self._runners[to_number]
+
+    async def _deliver(self, to_number, body):
+        for attempt in range(self.max_retries + 1):
+            await self._bucket.acquire()
+            try:
+                await self._loop.run_in_executor(self._executor, self.send_func, to_number, body)
+                self.sent += 1
+                return True
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    self.failed += 1
+                    print(f"WhatsApp mesajı gönderme hatası: {str(e)}")
+                    return False
+                self.retried += 1
+                delay = self.retry_backoff * (2 ** attempt)
+                await asyncio.sleep(delay + random.uniform(0, delay))
+
+    def stats(self) -> dict:
+        return {
+            "rate_per_second": self.rate,
+            "pending": sum(len(outbox) for outbox in self._outboxes.values()),
+            "queued": self.queued,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "coalesced": self.coalesced,
+        }
@@ -0,0 +1,99 @@
+# bot/parse_cache.py
+
+import hashlib
+import os
+import re
+import unicodedata
+
+from bot.metrics import metrics
+from bot.state_store import MemoryStateStore, SqliteStateStore, STATE_STORE_PATH
+
+# Çözümleme önbelleği ayarları
+PARSE_CACHE_TTL_SECONDS = int(os.getenv("PARSE_CACHE_TTL_SECONDS", 30 * 24 * 60 * 60))
+PARSE_CACHE_MEMORY_ENTRIES = int(os.getenv("PARSE_CACHE_MEMORY_ENTRIES", 2000))
+PARSE_CACHE_MAX_ENTRIES = int(os.getenv("PARSE_CACHE_MAX_ENTRIES", 100000))
+# Kalıcı katman: sqlite veya none
+PARSE_CACHE_BACKEND = os.getenv("PARSE_CACHE_BACKEND", "sqlite")
+PARSE_CACHE_PATH = os.getenv("PARSE_CACHE_PATH", STATE_STORE_PATH)
+
+CACHE_LOOKUPS = metrics.counter("bot_parse_cache_lookups_total", "Çözümleme önbelleği sorguları (katman ve sonuca göre)")
+
+_WHITESPACE_RE = re.compile(r"\s+")
+# Emoji ve benzeri semboller, görünmez biçim karakterleri
+_SYMBOL_CATEGORIES = {"So", "Sk", "Cs", "Co", "Cf"}
+_VARIATION_SELECTORS = {chr(c) for c in range(0xFE00, 0xFE10)}
+
+
+def normalize_message(message: str) -> str:
+    """Boşlukları, emojileri ve büyük/küçük harfi katlayarak mesajı normalize et"""
+    text = unicodedata.normalize("NFKC", message)
+    text = "".join(
+        c for c in text
+        if unicodedata.category(c) not in _SYMBOL_CATEGORIES and c not in _VARIATION_SELECTORS
+    )
+    text = text.casefold()
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def cache_key(message: str, version: str) -> str:
+    """Prompt sürümü ve normalize mesajdan içerik adresli anahtar üret"""
+    digest = hashlib.sha256(f"{version}\n{normalize_message(message)}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """GPT çözümleme sonuçları için iki katmanlı önbellek.
+
+    Bellekteki LRU katmanı sıcak kayıtları, SQLite katmanı süreçler ve
+    yeniden başlatmalar arası kayıtları tutar. Anahtar prompt sürümünü
+    içerdiği için prompt değişince eski kayıtlar kendiliğinden geçersizleşir.
+    """
+
+    def __init__(self, version: str, memory=None, persistent=None):
+        self.version = version
+        self.memory = memory or MemoryStateStore(ttl=PARSE_CACHE_TTL_SECONDS, max_entries=PARSE_CACHE_MEMORY_ENTRIES)
+        if persistent is None and PARSE_CACHE_BACKEND == "sqlite":
+            persistent = SqliteStateStore(
+                path=PARSE_CACHE_PATH,
+                table="parse_cache",
+                ttl=PARSE_CACHE_TTL_SECONDS,
+                max_entries=PARSE_CACHE_MAX_ENTRIES
+            )
+        self.persistent = persistent
+
+    def get(self, message: str):
+        key = cache_key(message, self.version)
+        result = self.memory.get(key)
+        if result is not None:
+            CACHE_LOOKUPS.inc(tier="memory", result="hit")
+            return dict(result)
+        if self.persistent is not None:
+            result = self.persistent.get(key)
+            if result is not None:
+                CACHE_LOOKUPS.inc(tier="persistent", result="hit")
+                self.memory.set(key, result)
+                return dict(result)
+        CACHE_LOOKUPS.inc(tier="all", result="miss")
+        return None
+
+    def set(self, message: str, result: dict):
+        if not result:
+            return
+        key = cache_key(message, self.version)
+        self.memory.set(key, dict(result))
+        if self.persistent is not None:
+            self.persistent.set(key, result)
+
+    def stats(self) -> dict:
+        memory_hits = CACHE_LOOKUPS.value(tier="memory", result="hit")
+        persistent_hits = CACHE_LOOKUPS.value(tier="persistent", result="hit")
+        misses = CACHE_LOOKUPS.value(tier="all", result="miss")
+        total = memory_hits + persistent_hits + misses
+        return {
+            "version": self.version,
+            "memory_entries": len(self.memory),
+            "memory_hits": memory_hits,
+            "persistent_hits": persistent_hits,
+            "misses": misses,
+            "hit_rate": round((memory_hits + persistent_hits) / total, 4) if total else 0.0,
+        }
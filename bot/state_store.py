@@ -0,0 +1,223 @@
+# bot/state_store.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Durum deposu ayarları
+STATE_STORE_BACKEND = os.getenv("STATE_STORE_BACKEND", "memory")
+STATE_STORE_PATH = os.getenv("STATE_STORE_PATH", "bot_state.db")
+STATE_TTL_SECONDS = int(os.getenv("STATE_TTL_SECONDS", 24 * 60 * 60))
+STATE_MAX_ENTRIES = int(os.getenv("STATE_MAX_ENTRIES", 10000))
+
+
+class StateStore:
+    """Anahtar-değer durum deposu arayüzü.
+
+    Değerler JSON'a çevrilebilir olmalıdır. Süresi dolan kayıtlar yokmuş gibi
+    davranır.
+    """
+
+    def get(self, key: str, default=None):
+        raise NotImplementedError
+
+    def set(self, key: str, value):
+        raise NotImplementedError
+
+    def add(self, key: str, value) -> bool:
+        """Anahtar yoksa (veya süresi dolmuşsa) kaydet, kaydedildiyse True döndür"""
+        raise NotImplementedError
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        """Sayaç değerini atomik olarak artır (en az 0), yeni değeri döndür.
+
+        Süresi dolmuş sayaç 0'dan başlar; her artırma süreyi yeniler.
+        """
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+
+class MemoryStateStore(StateStore):
+    """Tek süreç için LRU + TTL bellek deposu"""
+
+    def __init__(self, ttl: float = STATE_TTL_SECONDS, max_entries: int = STATE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            # En uzun süredir kullanılmayan kayıtları at
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def add(self, key, value):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] >= time.monotonic():
+                return False
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+            return True
+
+    def incr(self, key, amount=1):
+        with self._lock:
+            item = self._data.get(key)
+            current = item[1] if item is not None and item[0] >= time.monotonic() else 0
+            value = max(0, current + amount)
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+            return value
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class SqliteStateStore(StateStore):
+    """Süreçler arası paylaşılan SQLite (WAL) deposu.
+
+    Aynı makinedeki birden fazla uvicorn worker'ı aynı dosyayı kullanabilir.
+    """
+
+    def __init__(self, path: str = STATE_STORE_PATH, table: str = "user_states",
+                 ttl: float = STATE_TTL_SECONDS, max_entries: int = STATE_MAX_ENTRIES):
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        # Dosya ve tablo ilk kullanımda oluşturulur (import sırasında diske dokunulmaz)
+        self._ready = False
+
+    def _connect(self):
+        # sqlite3 bağlantıları thread'ler arasında paylaşılmamalı
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if not self._ready:
+                conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                    "expires_at REAL NOT NULL, updated_at REAL NOT NULL)"
+                )
+                conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{self.table}_updated_at ON {self.table} (updated_at)")
+                self._ready = True
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, default=None):
+        row = self._connect().execute(
+            f"SELECT value FROM {self.table} WHERE key = ? AND expires_at >= ?",
+            (key, time.time())
+        ).fetchone()
+        if row is None:
+            return default
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            f"INSERT INTO {self.table} (key, value, expires_at, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, "
+            "expires_at = excluded.expires_at, updated_at = excluded.updated_at",
+            (key, json.dumps(value, ensure_ascii=False), now + self.ttl, now)
+        )
+        self._writes += 1
+        # Temizliği her yazmada değil, belirli aralıklarla yap
+        if self._writes % 100 == 0:
+            self.cleanup()
+
+    def add(self, key, value):
+        now = time.time()
+        conn = self._connect()
+        # Süresi dolmuş kayıt varsa üzerine yazılabilir
+        cursor = conn.execute(
+            f"INSERT INTO {self.table} (key, value, expires_at, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, "
+            "expires_at = excluded.expires_at, updated_at = excluded.updated_at "
+            f"WHERE {self.table}.expires_at < ?",
+            (key, json.dumps(value, ensure_ascii=False), now + self.ttl, now, now)
+        )
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self.cleanup()
+        return cursor.rowcount == 1
+
+    def incr(self, key, amount=1):
+        now = time.time()
+        conn = self._connect()
+        # Tek UPSERT ifadesi; süreçler arası artırmalar kaybolmaz
+        conn.execute(
+            f"INSERT INTO {self.table} (key, value, expires_at, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = MAX(0, CASE WHEN "
+            f"{self.table}.expires_at < ? THEN 0 ELSE CAST({self.table}.value AS INTEGER) END + ?), "
+            "expires_at = excluded.expires_at, updated_at = excluded.updated_at",
+            (key, json.dumps(max(0, amount)), now + self.ttl, now, now, amount)
+        )
+        return self.get(key, 0)
+
+    def delete(self, key):
+        self._connect().execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def cleanup(self):
+        """Süresi dolan ve kapasiteyi aşan kayıtları sil"""
+        conn = self._connect()
+        conn.execute(f"DELETE FROM {self.table} WHERE expires_at < ?", (time.time(),))
+        conn.execute(
+            f"DELETE FROM {self.table} WHERE key IN ("
+            f"SELECT key FROM {self.table} ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def __len__(self):
+        row = self._connect().execute(
+            f"SELECT COUNT(*) FROM {self.table} WHERE expires_at >= ?", (time.time(),)
+        ).fetchone()
+        return row[0]
+
+
+def create_state_store(backend: str = STATE_STORE_BACKEND, table: str = "user_states",
+                       ttl: float = STATE_TTL_SECONDS, max_entries: int = STATE_MAX_ENTRIES,
+                       path: str = STATE_STORE_PATH) -> StateStore:
+    """Ayara göre durum deposu oluştur"""
+    if backend == "memory":
+        return MemoryStateStore(ttl=ttl, max_entries=max_entries)
+    if backend == "sqlite":
+        return SqliteStateStore(path=path, table=table, ttl=ttl, max_entries=max_entries)
+    raise ValueError(f"Bilinmeyen durum deposu: {backend}")
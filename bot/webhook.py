@@ -1,13 +1,9 @@
+import asyncio
 import sys
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 from twilio.twiml.messaging_response import MessagingResponse
-from datetime import datetime
-import json
-from twilio.rest import Client
 from sqlalchemy.orm import Session
-from googleapiclient.errors import HttpError
 import re
 import shutil
 
@@ -16,11 +12,22 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
-from bot.gpt_parser import parse_message_to_json
-from drive_service.uploader import upload_multiple_photos, upload_file_to_drive, get_or_create_folder, get_drive_service, delete_folder, get_folder_info, delete_folder_by_id
+from bot.gpt_parser import parse_message_to_json, parser_stats, parse_cache
+from bot.jobs import JobQueue, JobQueueFull, JOB_JOIN_TIMEOUT
+from bot.coalescer import MediaCoalescer
+from bot.outbound import OutboundDispatcher
+from bot.metrics import metrics, timed
+from bot.logs import log_event
+from bot import images
+from bot.media import transfer_media_to_drive
+from bot.fingerprints import fingerprints
+from bot.state_store import create_state_store
+from bot.idempotency import IdempotencyCache
+from bot.listing import generate_ilan_baslik, ilan_from_details
+from drive_service.storage import get_storage
 from backend.database import SessionLocal
-from backend.crud import create_emlak_ilan, get_ilanlar, delete_emlak_ilan, create_photo_upload_session, get_photo_upload_session, update_photo_upload_session, delete_photo_upload_session
-from backend.schemas.ilan import IlanCreate, PhotoUploadSessionCreate
+from backend.crud import create_emlak_ilan, get_ilanlar, search_ilanlar, delete_ilan_by_id, get_or_create_photo_upload_session, get_photo_upload_session, claim_session_folder, delete_photo_upload_session, add_photos_to_session
+from backend.schemas.ilan import PhotoUploadSessionCreate
 
 load_dotenv()
 
@@ -40,25 +47,53 @@ BACKEND_API_URL = os.getenv("BACKEND_API_URL", "http://localhost:8000/ilan")
 TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
 TWILIO_PHONE_NUMBER = os.getenv("TWILIO_PHONE_NUMBER")
+# /sil aramasında listelenecek en fazla ilan sayısı
+DELETE_SEARCH_LIMIT = int(os.getenv("DELETE_SEARCH_LIMIT", 10))
 
-# Twilio client oluştur
-twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+# Twilio client ilk mesaj gönderiminde oluşturulur
+twilio_client = None
 
-# Kullanıcı durumlarını takip etmek için sözlük
-user_states = {}
+def get_twilio_client():
+    global twilio_client
+    if twilio_client is None:
+        from twilio.rest import Client
 
-def generate_ilan_baslik(mahalle, sokak, oda_sayisi):
-    mahalle = ''.join(c for c in mahalle if c.isalnum() or c.isspace())
-    sokak = ''.join(c for c in sokak if c.isalnum() or c.isspace())
-    return f"{mahalle}-{sokak}-{oda_sayisi}"
+        twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+    return twilio_client
 
-def create_ilan_folder(service, ilan_details):
-    """İlan için Drive'da klasör oluştur"""
+# Kullanıcı durumlarını takip etmek için depo (STATE_STORE_BACKEND ile seçilir)
+user_states = create_state_store()
+
+# Kuyruk metrikleri (/metrics isteğinde güncellenir)
+QUEUE_DEPTH = metrics.gauge("bot_queue_depth", "Kuyrukta bekleyen iş/mesaj sayısı")
+ACTIVE_SENDERS = metrics.gauge("bot_active_senders", "Kuyrukta işi olan gönderici sayısı")
+DUPLICATE_WEBHOOKS = metrics.counter("bot_duplicate_webhooks_total", "MessageSid ile ayıklanan tekrar webhook'lar")
+
+# Giden mesaj kuyruğu (hız limiti ve tekrar deneme ile)
+outbound = OutboundDispatcher(send_func=lambda to_number, message: _send_via_twilio(to_number, message))
+
+# İşlenmiş mesajlar (Twilio tekrar denemeleri için)
+processed_messages = IdempotencyCache()
+
+# Medya işleri için arka plan kuyruğu
+media_jobs = JobQueue(name="media")
+
+# Gönderici başına henüz yüklenmemiş fotoğraf sayısı. Webhook'lar farklı
+# worker'lara düşebildiğinden /tamamla yerel kuyruğun yanında bu sayacı da
+# bekler (birden fazla worker için STATE_STORE_BACKEND=sqlite). Çöken bir
+# worker'ın bıraktığı sayaç MEDIA_PENDING_TTL_SECONDS sonra sıfırlanır.
+MEDIA_PENDING_TTL_SECONDS = int(os.getenv("MEDIA_PENDING_TTL_SECONDS", 600))
+MEDIA_PENDING_POLL_SECONDS = 0.2
+pending_media = create_state_store(table="pending_media", ttl=MEDIA_PENDING_TTL_SECONDS)
+
+# Albüm parçalarını gönderici başına tek işte toplayan birleştirici
+media_batches = MediaCoalescer(on_flush=lambda key, items, details: enqueue_media_batch(key, items, details))
+
+def create_ilan_folder(storage, ilan_details):
+    """İlan için depolamada (varsayılan Drive) klasör oluştur"""
     try:
-        # Ana klasör ID'sini .env'den al
-        main_folder_id = os.getenv("GOOGLE_DRIVE_MAIN_FOLDER_ID")
-        if not main_folder_id:
-            raise ValueError("GOOGLE_DRIVE_MAIN_FOLDER_ID bulunamadı")
+        # Ana klasör (Drive'da GOOGLE_DRIVE_MAIN_FOLDER_ID)
+        main_folder_id = storage.root_folder_id
 
         # İlan detaylarını al
         mahalle = ilan_details.get("mahalle", "Belirsiz")
@@ -74,88 +109,59 @@ def create_ilan_folder(service, ilan_details):
             parent_id = main_folder_id
         else:
             # Önce oda türü klasörünü oluştur veya bul
-            oda_folder_name = oda_sayisi.strip()
-            oda_folder = get_or_create_folder(service, oda_folder_name, main_folder_id)
-            parent_id = oda_folder.get('id')
+            parent_id = storage.get_or_create_folder(oda_sayisi.strip(), main_folder_id)
         
-        # İlan klasörünü oluştur
-        folder_metadata = {
-            'name': ilan_folder_name,
-            'mimeType': 'application/vnd.google-apps.folder',
-            'parents': [parent_id]
-        }
+        # İlan klasörünü oluştur ve herkese açık yap
+        folder_id = storage.create_folder(ilan_folder_name, parent_id, public=True)
         
-        folder = service.files().create(body=folder_metadata, fields='id').execute()
-        folder_id = folder.get('id')
-        
-        # Klasörü herkese açık yap
-        permission = {
-            'type': 'anyone',
-            'role': 'reader'
-        }
-        service.permissions().create(fileId=folder_id, body=permission).execute()
-        
-        print(f"Drive klasörü oluşturuldu. ID: {folder_id}")
+        log_event("drive_folder_created", folder_id=folder_id, backend=storage.name)
         return folder_id
     except Exception as e:
         print(f"Drive klasörü oluşturma hatası: {str(e)}")
         print(f"Hata detayı: {type(e).__name__}")
         raise
 
-def send_whatsapp_message(to_number: str, message: str):
-    """WhatsApp mesajı gönder"""
-    try:
-        message = twilio_client.messages.create(
+def _send_via_twilio(to_number: str, message: str):
+    """Mesajı Twilio API'si ile gönder, hata olursa exception fırlat"""
+    with timed("twilio_send", "twilio"):
+        message = get_twilio_client().messages.create(
             from_=f"whatsapp:{TWILIO_PHONE_NUMBER}",
             body=message,
             to=to_number
         )
-        print(f"WhatsApp mesajı gönderildi: {message.sid}")
+    log_event("whatsapp_sent", sid=message.sid)
+    return message.sid
+
+def send_whatsapp_message(to_number: str, message: str, coalesce_key: str = None):
+    """WhatsApp mesajı gönder.
+
+    Gönderici kuyruğu çalışıyorsa mesaj kuyruğa eklenir (hız limiti, tekrar
+    deneme ve aynı coalesce_key'li bekleyen mesajların birleştirilmesi);
+    aksi halde doğrudan gönderilir.
+    """
+    if outbound.running:
+        outbound.send(to_number, message, coalesce_key=coalesce_key)
+        return True
+    try:
+        _send_via_twilio(to_number, message)
         return True
     except Exception as e:
         print(f"WhatsApp mesajı gönderme hatası: {str(e)}")
         return False
 
-def process_ilan(from_number: str, ilan_details: dict, drive_folder_id: str):
+def process_ilan(from_number: str, ilan_details: dict, drive_folder_id: str, photo_count: int = 0):
     """İlanı işle ve veritabanına kaydet"""
     try:
-        # Drive klasör linkini oluştur
-        drive_link = f"https://drive.google.com/drive/folders/{drive_folder_id}"
+        # Klasör linkini oluştur
+        drive_link = get_storage().folder_link(drive_folder_id)
         
         # Veritabanına kaydet
         db = SessionLocal()
         try:
-            # Metrekare değerini float'a çevir
-            metrekare = ilan_details.get("metrekare", "")
-            try:
-                metrekare = float(metrekare) if metrekare else None
-            except ValueError:
-                metrekare = None
+            ilan_data = ilan_from_details(ilan_details, drive_link, drive_folder_id, photo_count)
 
-            # Fiyat değerini float'a çevir
-            fiyat = ilan_details.get("fiyat", "")
-            try:
-                fiyat = float(fiyat) if fiyat else None
-            except ValueError:
-                fiyat = None
-
-            # IlanCreate nesnesi oluştur
-            mahalle = ilan_details.get("mahalle", "")
-            sokak = ilan_details.get("sokak", "")
-            oda_sayisi = ilan_details.get("oda_sayisi", "")
-            baslik = generate_ilan_baslik(mahalle, sokak, oda_sayisi)
-            ilan_data = IlanCreate(
-                baslik=baslik,
-                aciklama=ilan_details.get("aciklama", ""),
-                fiyat=fiyat,
-                mahalle=mahalle,
-                sokak=sokak,
-                oda_sayisi=oda_sayisi,
-                metrekare=metrekare,
-                drive_link=drive_link
-            )
-            
-            db_ilan = create_emlak_ilan(db, ilan_data)
+            with timed("db_commit", "db"):
+                db_ilan = create_emlak_ilan(db, ilan_data)
             
             # Kullanıcıya bildirim gönder
             success_message = f"İlanınız başarıyla kaydedildi!\n\nDrive klasör linki: {drive_link}"
@@ -170,266 +176,335 @@ def process_ilan(from_number: str, ilan_details: dict, drive_folder_id: str):
         send_whatsapp_message(from_number, error_message)
         return False
 
+def process_media_job(from_number: str, ilan_details: dict, media_items: list):
+    """Gelen fotoğrafları indir, Drive'a yükle ve kullanıcıya bildir (arka plan işi)"""
+    db = SessionLocal()
+    try:
+        session = get_photo_upload_session(db, from_number)
+        if not session:
+            # İlk görsel geldiğinde session oluştur
+            session_data = PhotoUploadSessionCreate(
+                user_id=from_number,
+                expected_photos=999,  # Maksimum fotoğraf sayısı
+                received_photos=0,
+                drive_folder_id=None,
+                photo_links=[],
+                state="waiting_for_photos"
+            )
+            with timed("db_commit", "db"):
+                session = get_or_create_photo_upload_session(db, session_data)
+
+        if not session.drive_folder_id:
+            # Klasör satır kilidi altında oluşturulur; başka bir worker aynı anda
+            # oluşturuyorsa onun klasörü kullanılır
+            storage = get_storage()
+            with timed("drive_folder_create", storage.name):
+                drive_folder_id = claim_session_folder(
+                    db, from_number, lambda: create_ilan_folder(storage, ilan_details)
+                )
+        else:
+            drive_folder_id = session.drive_folder_id
+
+        # Medyaları eşzamanlı indir ve doğrudan Drive'a aktar; ilan klasörü
+        # create_ilan_folder'da herkese açık oluşturulduğu için paylaşım devralınır
+        links = transfer_media_to_drive(
+            media_items, drive_folder_id,
+            auth=HTTPBasicAuth(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN),
+            public_folder=True
+        )
+        uploaded = [link for link in links if link]
+        if uploaded:
+            # Veritabanında linkleri tek seferde güncelle
+            with timed("db_commit", "db"):
+                add_photos_to_session(db, from_number, uploaded)
+            log_event("photos_uploaded", user=from_number, count=len(uploaded))
+
+        session = get_photo_upload_session(db, from_number)
+        send_whatsapp_message(
+            from_number,
+            f"Fotoğraf başarıyla yüklendi. Toplam {session.received_photos} fotoğraf yüklendi. İşlem bittiğinde /tamamla komutunu kullanın.",
+            coalesce_key="photo_progress"
+        )
+    except Exception as e:
+        print(f"Fotoğraf işleme hatası: {str(e)}")
+        print(f"Hata detayı: {type(e).__name__}")
+        send_whatsapp_message(from_number, "Fotoğraflar yüklenirken bir hata oluştu. Lütfen tekrar deneyiniz.")
+    finally:
+        db.close()
+        pending_media.incr(from_number, -len(media_items))
+
+def enqueue_media_batch(from_number: str, media_items: list, ilan_details: dict):
+    """Birleştirilen medya grubunu göndericinin iş kuyruğuna ekle"""
+    try:
+        media_jobs.submit(from_number, process_media_job, from_number, ilan_details, media_items)
+    except JobQueueFull:
+        pending_media.incr(from_number, -len(media_items))
+        print(f"İş kuyruğu dolu, {len(media_items)} fotoğraf reddedildi: {from_number}")
+        send_whatsapp_message(from_number, "Sistem şu anda yoğun. Lütfen fotoğrafları birazdan tekrar gönderiniz.")
+
+async def wait_for_pending_media(from_number: str, timeout: float = JOB_JOIN_TIMEOUT) -> bool:
+    """Göndericinin tüm worker'lardaki fotoğrafları yüklenene kadar bekle.
+
+    Süre dolmadan bittiyse True döner.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    # Bu worker'daki albüm parçalarını hemen kuyruğa al ve yerel işleri bekle
+    media_batches.flush(from_number)
+    if not await media_jobs.join(from_number, timeout=timeout):
+        return False
+    # Diğer worker'lara düşen fotoğraflar paylaşılan sayaçtan izlenir
+    while pending_media.get(from_number, 0) > 0:
+        if loop.time() >= deadline:
+            return False
+        await asyncio.sleep(MEDIA_PENDING_POLL_SECONDS)
+    return True
+
+@app.on_event("startup")
+async def start_media_jobs():
+    await outbound.start()
+    await media_jobs.start()
+
+@app.on_event("shutdown")
+async def stop_media_jobs():
+    media_batches.flush_all()
+    await media_jobs.stop()
+    await outbound.stop()
+    images.shutdown()
+
 @app.post("/webhook")
 async def receive_message(request: Request):
+    message_sid = None
     try:
         form_data = await request.form()
-        from_number = form_data.get("From")
-        message_body = form_data.get("Body")
-        num_media = int(form_data.get("NumMedia", 0))
-
-        print(f"\nYeni mesaj geldi: {from_number} - {message_body} (Foto sayısı: {num_media})")
-        print(f"Form verileri: {dict(form_data)}")
-        print(f"Mevcut kullanıcı durumu: {json.dumps(user_states.get(from_number, {}), indent=2)}")
+        message_sid = form_data.get("MessageSid")
+
+        # Twilio tekrar denemelerini MessageSid ile ayıkla
+        if message_sid:
+            cached_content = processed_messages.begin(message_sid)
+            if cached_content is not None:
+                DUPLICATE_WEBHOOKS.inc()
+                log_event("duplicate_webhook", sample_rate=1, message_sid=message_sid)
+                return Response(content=cached_content, media_type="application/xml")
+
+        with timed("webhook"):
+            response = await handle_message(form_data)
+        if message_sid:
+            processed_messages.complete(message_sid, response.body.decode())
+        return response
 
-        # TwiML yanıtı oluştur
+    except Exception as e:
+        if message_sid:
+            processed_messages.release(message_sid)
+        print(f"Genel hata: {str(e)}")
+        print(f"Hata detayı: {type(e).__name__}")
         resp = MessagingResponse()
+        resp.message("Bir hata oluştu. Lütfen tekrar deneyiniz.")
+        return Response(content=str(resp), media_type="application/xml")
 
-        # Kullanıcının mevcut durumunu kontrol et
-        current_state = user_states.get(from_number, {})
-
-        if message_body and message_body.strip().lower() == "/tamamla":
-            if current_state.get("state") == "waiting_for_photos":
-                # İlanı tamamla
-                db = SessionLocal()
-                try:
-                    session = get_photo_upload_session(db, from_number)
-                    if not session:
-                        resp.message("Önce ilan detaylarını girmeniz gerekiyor.")
-                        response = Response(content=str(resp), media_type="application/xml")
-                        return response
-
-                    if session.received_photos == 0:
-                        resp.message("En az bir fotoğraf eklemeniz gerekiyor.")
-                        response = Response(content=str(resp), media_type="application/xml")
-                        return response
-
-                    if process_ilan(from_number, current_state["details"], session.drive_folder_id):
-                        # Drive klasör linkini oluştur
-                        drive_link = f"https://drive.google.com/drive/folders/{session.drive_folder_id}"
-                        delete_photo_upload_session(db, from_number)
-                        user_states[from_number] = {}
-                        resp.message(f"İlanınız başarıyla kaydedildi!\n\nDrive klasör linki: {drive_link}")
-                    else:
-                        resp.message("İlan kaydedilirken bir hata oluştu. Lütfen tekrar deneyiniz.")
-                finally:
-                    db.close()
-            else:
-                resp.message("Önce ilan detaylarını girmeniz gerekiyor.")
-            response = Response(content=str(resp), media_type="application/xml")
-            return response
+async def handle_message(form_data):
+    """Gelen WhatsApp mesajını kullanıcının durumuna göre işle"""
+    from_number = form_data.get("From")
+    message_body = form_data.get("Body")
+    num_media = int(form_data.get("NumMedia", 0))
 
-        elif message_body and message_body.strip().lower() == "/sil":
-            # Silme işlemi için kullanıcıdan anahtar kelime iste
-            user_states[from_number] = {
-                "state": "waiting_for_search_keyword",
-                "action": "delete"
-            }
-            resp.message("Lütfen silmek istediğiniz klasör için bir anahtar kelime (ör: mahalle, oda tipi, vs.) giriniz.")
-            response = Response(content=str(resp), media_type="application/xml")
-            return response
+    # Kullanıcının mevcut durumunu kontrol et
+    current_state = user_states.get(from_number, {})
+    log_event("message_received", user=from_number, num_media=num_media, state=current_state.get("state"))
 
-        elif current_state.get("state") == "waiting_for_search_keyword" and current_state.get("action") == "delete":
-            search_keyword = message_body.strip()
-            drive_service = get_drive_service()
-            success, folder_info = get_folder_info(drive_service, search_keyword)
-            if not success:
-                resp.message(f"Klasör bulunamadı. Lütfen anahtar kelimeyi kontrol ediniz.")
-                response = Response(content=str(resp), media_type="application/xml")
-                return response
+    # TwiML yanıtı oluştur
+    resp = MessagingResponse()
 
-            # Klasörlerin tam yolunu bulmak için yardımcı fonksiyon
-            def get_folder_path(service, folder_id, name_cache=None):
-                if name_cache is None:
-                    name_cache = {}
-                try:
-                    folder = service.files().get(fileId=folder_id, fields="id, name, parents").execute()
-                    name = folder['name']
-                    parents = folder.get('parents', [])
-                    if not parents:
-                        return name
-                    parent_id = parents[0]
-                    if parent_id in name_cache:
-                        parent_name = name_cache[parent_id]
-                    else:
-                        parent = service.files().get(fileId=parent_id, fields="id, name, parents").execute()
-                        parent_name = parent['name']
-                        name_cache[parent_id] = parent_name
-                    return f"{get_folder_path(service, parent_id, name_cache)}/{name}"
-                except HttpError:
-                    return name
-
-            # Klasörleri numaralandırılmış liste olarak göster
-            folder_list = []
-            for idx, item in enumerate(folder_info, 1):
-                folder_path = get_folder_path(drive_service, item['id'])
-                folder_list.append(f"{idx}. {folder_path}")
-
-            folder_list_text = "\n".join(folder_list)
-            resp.message(f"Bulunan klasörler:\n{folder_list_text}\n\nLütfen silmek istediğiniz klasörün numarasını giriniz.")
-            
-            # Klasör bilgilerini state'e kaydet
-            user_states[from_number] = {
-                "state": "waiting_for_folder_number",
-                "action": "delete",
-                "folder_list": folder_info
-            }
-            response = Response(content=str(resp), media_type="application/xml")
-            return response
+    if message_body and message_body.strip().lower() == "/tamamla":
+        if current_state.get("state") == "waiting_for_photos":
+            # Önce bu kullanıcının bekleyen ve kuyruktaki fotoğraflarının bitmesini bekle
+            if not await wait_for_pending_media(from_number):
+                resp.message("Fotoğraflarınız hâlâ yükleniyor. Lütfen birazdan tekrar /tamamla yazınız.")
+                return Response(content=str(resp), media_type="application/xml")
 
-        elif current_state.get("state") == "waiting_for_folder_number" and current_state.get("action") == "delete":
+            # İlanı tamamla
+            db = SessionLocal()
             try:
-                folder_number = int(message_body.strip())
-                folder_list = current_state.get("folder_list", [])
-                
-                if folder_number < 1 or folder_number > len(folder_list):
-                    resp.message("Geçersiz numara. Lütfen listeden bir numara seçiniz.")
+                session = get_photo_upload_session(db, from_number)
+                if not session:
+                    resp.message("Önce ilan detaylarını girmeniz gerekiyor.")
                     response = Response(content=str(resp), media_type="application/xml")
                     return response
 
-                selected_folder = folder_list[folder_number - 1]
-                folder_id = selected_folder['id']
-
-                drive_service = get_drive_service()
-                # Klasörü id ile sil
-                drive_success, drive_message = delete_folder_by_id(drive_service, folder_id)
+                if session.received_photos == 0:
+                    resp.message("En az bir fotoğraf eklemeniz gerekiyor.")
+                    response = Response(content=str(resp), media_type="application/xml")
+                    return response
 
-                # Veritabanından ilanı sil
-                db = SessionLocal()
-                try:
-                    # Klasör adını veritabanındaki başlık formatına çevir
-                    db_folder_name = selected_folder['name'].replace(" #SADEEVIM", "").strip()
-                    db_success, db_message = delete_emlak_ilan(db, db_folder_name)
-                finally:
-                    db.close()
-
-                # Sonucu kullanıcıya bildir
-                if drive_success and db_success:
-                    resp.message("İlan ve ilgili klasör başarıyla silindi.")
+                if process_ilan(from_number, current_state["details"], session.drive_folder_id, session.received_photos):
+                    # Klasör linkini oluştur
+                    drive_link = get_storage().folder_link(session.drive_folder_id)
+                    delete_photo_upload_session(db, from_number)
+                    user_states.delete(from_number)
+                    resp.message(f"İlanınız başarıyla kaydedildi!\n\nDrive klasör linki: {drive_link}")
                 else:
-                    error_message = "İlan silinirken hatalar oluştu:\n"
-                    if not drive_success:
-                        error_message += f"Drive: {drive_message}\n"
-                    if not db_success:
-                        error_message += f"Veritabanı: {db_message}"
-                    resp.message(error_message)
-
-            except ValueError:
-                resp.message("Lütfen geçerli bir numara giriniz.")
+                    resp.message("İlan kaydedilirken bir hata oluştu. Lütfen tekrar deneyiniz.")
+            finally:
+                db.close()
+        else:
+            resp.message("Önce ilan detaylarını girmeniz gerekiyor.")
+        response = Response(content=str(resp), media_type="application/xml")
+        return response
+
+    elif message_body and message_body.strip().lower() == "/sil":
+        # Silme işlemi için kullanıcıdan anahtar kelime iste
+        user_states.set(from_number, {
+            "state": "waiting_for_search_keyword",
+            "action": "delete"
+        })
+        resp.message("Lütfen silmek istediğiniz klasör için bir anahtar kelime (ör: mahalle, oda tipi, vs.) giriniz.")
+        response = Response(content=str(resp), media_type="application/xml")
+        return response
+
+    elif current_state.get("state") == "waiting_for_search_keyword" and current_state.get("action") == "delete":
+        search_keyword = message_body.strip()
+        # Arama veritabanındaki ilanlar üzerinden yapılır (Drive'da arama yok)
+        db = SessionLocal()
+        try:
+            with timed("db_search", "db"):
+                ilanlar = search_ilanlar(db, search_keyword, limit=DELETE_SEARCH_LIMIT) if search_keyword else []
+        finally:
+            db.close()
+        if not ilanlar:
+            resp.message(f"İlan bulunamadı. Lütfen anahtar kelimeyi kontrol ediniz.")
+            response = Response(content=str(resp), media_type="application/xml")
+            return response
+
+        # İlanları numaralandırılmış liste olarak göster
+        ilan_list = []
+        for idx, ilan in enumerate(ilanlar, 1):
+            ilan_list.append(f"{idx}. {ilan.baslik} ({ilan.photo_count or 0} fotoğraf)")
+
+        ilan_list_text = "\n".join(ilan_list)
+        resp.message(f"Bulunan ilanlar:\n{ilan_list_text}\n\nLütfen silmek istediğiniz ilanın numarasını giriniz.")
+        
+        # Seçim için ilan ve klasör ID'lerini state'e kaydet
+        user_states.set(from_number, {
+            "state": "waiting_for_folder_number",
+            "action": "delete",
+            "ilan_list": [
+                {"id": ilan.id, "baslik": ilan.baslik, "drive_folder_id": ilan.drive_folder_id}
+                for ilan in ilanlar
+            ]
+        })
+        response = Response(content=str(resp), media_type="application/xml")
+        return response
+
+    elif current_state.get("state") == "waiting_for_folder_number" and current_state.get("action") == "delete":
+        try:
+            ilan_number = int(message_body.strip())
+            ilan_list = current_state.get("ilan_list", [])
+            
+            if ilan_number < 1 or ilan_number > len(ilan_list):
+                resp.message("Geçersiz numara. Lütfen listeden bir numara seçiniz.")
                 response = Response(content=str(resp), media_type="application/xml")
                 return response
 
-            # Kullanıcı durumunu sıfırla
-            user_states[from_number] = {}
+            selected = ilan_list[ilan_number - 1]
+            folder_id = selected.get("drive_folder_id")
 
+            # Klasörü id ile sil (klasörü kayıtlı olmayan eski ilanlarda atlanır)
+            drive_success, drive_message = True, None
+            if folder_id:
+                try:
+                    get_storage().delete(folder_id)
+                    fingerprints.remove_folder(folder_id)
+                except Exception as e:
+                    print(f"Klasör silme hatası: {str(e)}")
+                    drive_success, drive_message = False, f"Klasör silinirken hata oluştu: {str(e)}"
+
+            # Veritabanından ilanı id ile sil
+            db = SessionLocal()
+            try:
+                with timed("db_commit", "db"):
+                    db_success, db_message = delete_ilan_by_id(db, selected["id"])
+            finally:
+                db.close()
+
+            # Sonucu kullanıcıya bildir
+            if drive_success and db_success and not folder_id:
+                resp.message("İlan silindi. İlana kayıtlı bir klasör bulunamadığı için klasör silme atlandı.")
+            elif drive_success and db_success:
+                resp.message("İlan ve ilgili klasör başarıyla silindi.")
+            else:
+                error_message = "İlan silinirken hatalar oluştu:\n"
+                if not drive_success:
+                    error_message += f"Drive: {drive_message}\n"
+                if not db_success:
+                    error_message += f"Veritabanı: {db_message}"
+                resp.message(error_message)
+
+        except ValueError:
+            resp.message("Lütfen geçerli bir numara giriniz.")
             response = Response(content=str(resp), media_type="application/xml")
             return response
 
-        # Eğer kullanıcı herhangi bir durumda değilse ve mesaj gönderdiyse, ilan detaylarını analiz et
-        elif not current_state:
-            try:
-                print(f"İlan detayları analiz ediliyor: {message_body}")
-                parsed_details = parse_message_to_json(message_body)
-                print(f"Analiz sonucu: {json.dumps(parsed_details, indent=2)}")
-                
-                if not parsed_details:
-                    print("İlan detayları analiz edilemedi")
-                    resp.message("İlan detayları analiz edilemedi. Lütfen daha açıklayıcı bir şekilde tekrar giriniz.")
-                    response = Response(content=str(resp), media_type="application/xml")
-                    print(f"Gönderilen yanıt: {str(resp)}")
-                    return response
-                
-                # İlan detaylarını kaydet ve fotoğraf bekleme durumuna geç
-                user_states[from_number] = {
-                    "state": "waiting_for_photos",
-                    "details": parsed_details,
-                    "photos": [],
-                    "temp_photos": []
-                }
-                print(f"İlan detayları kaydedildi: {json.dumps(parsed_details, indent=2)}")
-                resp.message("İlan detayları kaydedildi. Şimdi fotoğrafları gönderebilirsiniz. İşlem bittiğinde /tamamla komutunu kullanın.")
-                response = Response(content=str(resp), media_type="application/xml")
-                print(f"Gönderilen yanıt: {str(resp)}")
-                return response
-            except Exception as e:
-                print(f"İlan detayları analiz hatası: {str(e)}")
-                print(f"Hata detayı: {type(e).__name__}")
-                resp.message("İlan detayları analiz edilirken bir hata oluştu. Lütfen tekrar deneyiniz.")
+        # Kullanıcı durumunu sıfırla
+        user_states.delete(from_number)
+
+        response = Response(content=str(resp), media_type="application/xml")
+        return response
+
+    # Eğer kullanıcı herhangi bir durumda değilse ve mesaj gönderdiyse, ilan detaylarını analiz et
+    elif not current_state:
+        try:
+            parsed_details = await parse_message_to_json(message_body)
+            
+            if not parsed_details:
+                log_event("parse_failed", sample_rate=1, user=from_number)
+                resp.message("İlan detayları analiz edilemedi. Lütfen daha açıklayıcı bir şekilde tekrar giriniz.")
                 response = Response(content=str(resp), media_type="application/xml")
-                print(f"Gönderilen yanıt: {str(resp)}")
                 return response
-
-        elif current_state.get("state") == "waiting_for_photos":
+            
+            # Süresi dolan yarım ilandan kalan fotoğraf oturumu silinir; yoksa yeni
+            # fotoğraflar eski ilanın klasörüne yüklenir
             db = SessionLocal()
-            session = get_photo_upload_session(db, from_number)
-            if not session:
-                # İlk görsel geldiğinde session oluştur
-                session_data = PhotoUploadSessionCreate(
-                    user_id=from_number,
-                    expected_photos=999,  # Maksimum fotoğraf sayısı
-                    received_photos=0,
-                    drive_folder_id=None,
-                    photo_links=[],
-                    state="waiting_for_photos"
-                )
-                session = create_photo_upload_session(db, session_data)
-
-            if num_media > 0:
-                print(f"\nYeni görseller alındı: {num_media} adet")
-                import time
-                if not session.drive_folder_id:
-                    service = get_drive_service()
-                    drive_folder_id = create_ilan_folder(service, current_state["details"])
-                    update_photo_upload_session(db, from_number, drive_folder_id=drive_folder_id)
-                else:
-                    drive_folder_id = session.drive_folder_id
-
-                for i in range(num_media):
-                    media_url = form_data.get(f"MediaUrl{i}")
-                    media_type = form_data.get(f"MediaContentType{i}")
-                    ext = ".jpg" if "jpeg" in media_type else ".png"
-                    try:
-                        response = requests.get(media_url, auth=HTTPBasicAuth(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN))
-                        if response.status_code == 200:
-                            temp_filename = f"photo_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{i}{ext}"
-                            with open(temp_filename, "wb") as f:
-                                f.write(response.content)
-                            # Drive'a yükle
-                            service = get_drive_service()
-                            file_link = upload_file_to_drive(temp_filename, temp_filename, drive_folder_id)
-                            # Veritabanında linki güncelle
-                            photo_links = session.photo_links or []
-                            photo_links.append(file_link)
-                            update_photo_upload_session(db, from_number, received_photos=session.received_photos+1, photo_links=photo_links)
-                            print(f"Fotoğraf yüklendi: {file_link}")
-                            os.remove(temp_filename)
-                        else:
-                            print(f"Fotoğraf indirme hatası: {response.status_code}")
-                            print(f"Hata detayı: {response.text}")
-                    except Exception as e:
-                        print(f"Fotoğraf indirme hatası: {str(e)}")
-                        print(f"Hata detayı: {type(e).__name__}")
-
-                session = get_photo_upload_session(db, from_number)
-                send_whatsapp_message(from_number, f"Fotoğraf başarıyla yüklendi. Toplam {session.received_photos} fotoğraf yüklendi. İşlem bittiğinde /tamamla komutunu kullanın.")
-                db.close()
-                return Response(content="", media_type="application/xml")
-            else:
-                print("Görsel beklenirken medya yok")
-                send_whatsapp_message(from_number, "Lütfen fotoğraf gönderin veya işlemi tamamlamak için /tamamla komutunu kullanın.")
+            try:
+                with timed("db_commit", "db"):
+                    delete_photo_upload_session(db, from_number)
+            finally:
                 db.close()
-                return Response(content="", media_type="application/xml")
 
-        # Varsayılan yanıt
-        resp.message("İlan eklemek için ilan detaylarını giriniz. İşlem bittiğinde /tamamla komutunu kullanın.")
-        return Response(content=str(resp), media_type="application/xml")
+            # İlan detaylarını kaydet ve fotoğraf bekleme durumuna geç
+            user_states.set(from_number, {
+                "state": "waiting_for_photos",
+                "details": parsed_details,
+                "photos": [],
+                "temp_photos": []
+            })
+            log_event("listing_parsed", user=from_number, details=parsed_details)
+            resp.message("İlan detayları kaydedildi. Şimdi fotoğrafları gönderebilirsiniz. İşlem bittiğinde /tamamla komutunu kullanın.")
+            response = Response(content=str(resp), media_type="application/xml")
+            return response
+        except Exception as e:
+            print(f"İlan detayları analiz hatası: {str(e)}")
+            print(f"Hata detayı: {type(e).__name__}")
+            resp.message("İlan detayları analiz edilirken bir hata oluştu. Lütfen tekrar deneyiniz.")
+            response = Response(content=str(resp), media_type="application/xml")
+            return response
 
-    except Exception as e:
-        print(f"Genel hata: {str(e)}")
-        print(f"Hata detayı: {type(e).__name__}")
-        resp = MessagingResponse()
-        resp.message("Bir hata oluştu. Lütfen tekrar deneyiniz.")
-        return Response(content=str(resp), media_type="application/xml")
+    elif current_state.get("state") == "waiting_for_photos":
+        if num_media > 0:
+            media_items = [
+                (form_data.get(f"MediaUrl{i}"), form_data.get(f"MediaContentType{i}"))
+                for i in range(num_media)
+            ]
+            # Albümün diğer parçalarıyla birleştirilmek üzere gruba ekle ve Twilio'ya hemen yanıt dön
+            pending_media.incr(from_number, len(media_items))
+            media_batches.add(from_number, media_items, current_state["details"])
+            return Response(content="", media_type="application/xml")
+        else:
+            resp.message("Lütfen fotoğraf gönderin veya işlemi tamamlamak için /tamamla komutunu kullanın.")
+            return Response(content=str(resp), media_type="application/xml")
+
+    # Varsayılan yanıt
+    resp.message("İlan eklemek için ilan detaylarını giriniz. İşlem bittiğinde /tamamla komutunu kullanın.")
+    return Response(content=str(resp), media_type="application/xml")
 
 @app.get("/ilan")
 async def get_ilanlar_endpoint():
@@ -444,3 +519,19 @@ async def get_ilanlar_endpoint():
         print(f"İlanları getirme hatası: {str(e)}")
         print(f"Hata detayı: {type(e).__name__}")
         return {"error": "İlanlar getirilirken bir hata oluştu"}
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metin formatında metrikler"""
+    job_stats = media_jobs.stats()
+    QUEUE_DEPTH.set(job_stats["depth"], queue="media")
+    QUEUE_DEPTH.set(outbound.stats()["pending"], queue="outbound")
+    ACTIVE_SENDERS.set(job_stats["active_senders"])
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/jobs/stats")
+async def get_job_stats():
+    """Arka plan kuyruklarının, tekrar önbelleğinin ve çözümleyicinin durumunu döndür"""
+    return {**media_jobs.stats(), "coalescer": media_batches.stats(), "outbound": outbound.stats(),
+            "idempotency": processed_messages.stats(), "parser": parser_stats(),
+            "parse_cache": parse_cache.stats()}
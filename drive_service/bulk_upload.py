@@ -0,0 +1,205 @@
+# drive_service/bulk_upload.py
+
+import hashlib
+import mimetypes
+import os
+import random
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bot.metrics import metrics, timed
+from bot.state_store import SqliteStateStore, STATE_STORE_PATH
+from drive_service import uploader
+
+# Aynı anda yüklenecek en fazla dosya sayısı
+DRIVE_UPLOAD_CONCURRENCY = int(os.getenv("DRIVE_UPLOAD_CONCURRENCY", 4))
+# Geçici hatalarda (429, 5xx, bağlantı) dosya başına tekrar deneme
+DRIVE_UPLOAD_MAX_RETRIES = int(os.getenv("DRIVE_UPLOAD_MAX_RETRIES", 5))
+DRIVE_UPLOAD_RETRY_BACKOFF = float(os.getenv("DRIVE_UPLOAD_RETRY_BACKOFF", 1.0))
+# Yükleme oturumlarının (resumable session URI) saklandığı SQLite dosyası
+DRIVE_UPLOAD_SESSION_PATH = os.getenv("DRIVE_UPLOAD_SESSION_PATH", STATE_STORE_PATH)
+# Drive oturum URI'leri bir hafta geçerlidir
+DRIVE_UPLOAD_SESSION_TTL = int(os.getenv("DRIVE_UPLOAD_SESSION_TTL", 6 * 24 * 60 * 60))
+
+UPLOAD_BYTES = metrics.counter("bot_drive_upload_bytes_total", "Drive'a yüklenen bayt")
+UPLOAD_RETRIES = metrics.counter("bot_drive_upload_retries_total", "Tekrar denenen Drive yükleme parçaları")
+
+_TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504}
+# Süresi dolmuş veya geçersiz oturum URI'si
+_EXPIRED_SESSION_STATUSES = {404, 410}
+
+_sessions = None
+_sessions_lock = threading.Lock()
+
+
+def get_session_store():
+    """Yükleme oturumlarını tutan kalıcı depo"""
+    global _sessions
+    if _sessions is None:
+        with _sessions_lock:
+            if _sessions is None:
+                _sessions = SqliteStateStore(
+                    path=DRIVE_UPLOAD_SESSION_PATH,
+                    table="upload_sessions",
+                    ttl=DRIVE_UPLOAD_SESSION_TTL
+                )
+    return _sessions
+
+
+def session_key(path: str, parent_folder_id: str = None) -> str:
+    """Dosya yolu, boyutu, değişiklik zamanı ve hedef klasörden oturum anahtarı üret"""
+    stat = os.stat(path)
+    raw = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}|{parent_folder_id or ''}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _status(error):
+    resp = getattr(error, "resp", None)
+    status = getattr(resp, "status", None)
+    return int(status) if status is not None else None
+
+
+def is_transient(error: Exception) -> bool:
+    """Tekrar denenebilecek hatalar: 408/429/5xx ve ağ hataları"""
+    import httplib2
+
+    if isinstance(error, (socket.timeout, ConnectionError, httplib2.HttpLib2Error)):
+        return True
+    return _status(error) in _TRANSIENT_STATUSES
+
+
+class UploadStats:
+    """Toplu yüklemenin toplam throughput istatistikleri"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.files = 0
+        self.failed = 0
+        self.resumed = 0
+        self.skipped = 0
+        self.retries = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def summary(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "files": self.files,
+            "failed": self.failed,
+            "resumed": self.resumed,
+            "skipped": self.skipped,
+            "retries": self.retries,
+            "bytes": self.bytes,
+            "elapsed_seconds": round(elapsed, 2),
+            "mb_per_second": round(self.bytes / elapsed / (1024 * 1024), 2) if elapsed else 0.0,
+        }
+
+
+def upload_file_resumable(path: str, parent_folder_id: str = None, stats: UploadStats = None) -> str:
+    """Dosyayı parça parça (resumable) yükle, dosya ID'sini döndür.
+
+    Oturum URI'si her parçadan sonra kaydedilir; süreç yeniden başlarsa
+    yükleme kaldığı bayttan devam eder. Daha önce tamamlanmış dosyalar için
+    kayıtlı ID döner. Geçici hatalarda parça, jitter'lı bekleme ile tekrar
+    denenir.
+    """
+    from googleapiclient.http import MediaFileUpload
+
+    stats = stats or UploadStats()
+    store = get_session_store()
+    key = session_key(path, parent_folder_id)
+    saved = store.get(key) or {}
+    if saved.get("file_id"):
+        stats.add(skipped=1)
+        return saved["file_id"]
+
+    service = uploader.get_drive_service()
+    mimetype, _ = mimetypes.guess_type(path)
+    file_metadata = {'name': os.path.basename(path)}
+    if parent_folder_id:
+        file_metadata['parents'] = [parent_folder_id]
+
+    def new_request():
+        media = MediaFileUpload(
+            path,
+            mimetype=mimetype or 'image/jpeg',
+            chunksize=uploader.UPLOAD_CHUNK_SIZE,
+            resumable=True
+        )
+        return service.files().create(body=file_metadata, media_body=media, fields='id')
+
+    request = new_request()
+    # Bu çalıştırmada gönderilen bayt (önceki oturumda gönderilenler sayılmaz)
+    uploaded = 0
+    if saved.get("uri"):
+        # Önceki oturuma devam et: ilk istek sunucudaki ilerlemeyi sorgular
+        request.resumable_uri = saved["uri"]
+        request._in_error_state = True
+        uploaded = saved.get("progress", 0)
+        stats.add(resumed=1)
+
+    attempt = 0
+    response = None
+    with timed("drive_upload", "drive"):
+        while response is None:
+            try:
+                _, response = request.next_chunk()
+            except Exception as e:
+                expired = _status(e) in _EXPIRED_SESSION_STATUSES and request.resumable_uri
+                if attempt >= DRIVE_UPLOAD_MAX_RETRIES or not (expired or is_transient(e)):
+                    raise
+                if expired:
+                    # Oturum geçersiz; baştan yeni oturum aç
+                    store.delete(key)
+                    request = new_request()
+                    uploaded = 0
+                attempt += 1
+                stats.add(retries=1)
+                UPLOAD_RETRIES.inc()
+                delay = DRIVE_UPLOAD_RETRY_BACKOFF * (2 ** min(attempt - 1, 5))
+                time.sleep(delay + random.uniform(0, delay))
+                continue
+            progress = request.resumable_progress
+            if progress > uploaded:
+                UPLOAD_BYTES.inc(progress - uploaded)
+                stats.add(bytes=progress - uploaded)
+                uploaded = progress
+            if response is None and request.resumable_uri:
+                store.set(key, {"uri": request.resumable_uri, "progress": progress})
+
+    size = os.path.getsize(path)
+    if size > uploaded:
+        UPLOAD_BYTES.inc(size - uploaded)
+        stats.add(bytes=size - uploaded)
+    file_id = response.get('id')
+    store.set(key, {"file_id": file_id})
+    stats.add(files=1)
+    return file_id
+
+
+def upload_files(paths: list, parent_folder_id: str = None, concurrency: int = DRIVE_UPLOAD_CONCURRENCY):
+    """Dosyaları eşzamanlı yükle.
+
+    (dosya ID'leri, istatistikler) döndürür; ID listesi paths ile aynı
+    sıradadır, yüklenemeyen dosyalar için None döner.
+    """
+    stats = UploadStats()
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1), thread_name_prefix="drive-upload") as executor:
+        futures = [executor.submit(upload_file_resumable, path, parent_folder_id, stats) for path in paths]
+        file_ids = []
+        for path, future in zip(paths, futures):
+            try:
+                file_ids.append(future.result())
+            except Exception as e:
+                print(f"Görsel yükleme hatası ({os.path.basename(path)}): {str(e)}")
+                print(f"Hata detayı: {type(e).__name__}")
+                stats.add(failed=1)
+                file_ids.append(None)
+    return file_ids, stats.summary()
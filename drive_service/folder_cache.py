@@ -0,0 +1,97 @@
+# drive_service/folder_cache.py
+
+import os
+import threading
+import time
+
+from bot.metrics import metrics
+
+# Çözülen klasör ID'lerinin geçerlilik süresi (saniye); Drive'da elle silinen
+# klasörler en geç bu süre sonunda yeniden sorgulanır
+FOLDER_CACHE_TTL = int(os.getenv("DRIVE_FOLDER_CACHE_TTL", 3600))
+
+FOLDER_CACHE_LOOKUPS = metrics.counter("bot_drive_folder_cache_total", "Klasör çözümleme önbelleği (sonuca göre)")
+
+
+class FolderCache:
+    """(üst klasör, ad) -> klasör eşlemesinin bellekteki önbelleği.
+
+    Aynı anahtar için eşzamanlı ıskalamalar tek bir Drive sorgusunda
+    birleştirilir (single-flight): ilk gelen klasörü bulur veya oluşturur,
+    diğerleri onun sonucunu kullanır. Böylece aynı anda gelen iki ilan aynı
+    oda türü klasörünü iki kez oluşturmaz.
+    """
+
+    def __init__(self, ttl: int = FOLDER_CACHE_TTL):
+        self.ttl = ttl
+        self._entries = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            folder, expires_at = entry
+            if time.monotonic() > expires_at:
+                del self._entries[key]
+                return None
+            return folder
+
+    def get_or_create(self, service, folder_name, parent_id, resolve):
+        """Klasörü önbellekten döndür; yoksa resolve(service, ad, üst) ile çöz"""
+        key = (parent_id, folder_name)
+        folder = self._lookup(key)
+        if folder is not None:
+            FOLDER_CACHE_LOOKUPS.inc(result="hit")
+            return folder
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                # Beklerken başka bir thread çözmüş olabilir
+                folder = self._lookup(key)
+                if folder is not None:
+                    FOLDER_CACHE_LOOKUPS.inc(result="coalesced")
+                    return folder
+                FOLDER_CACHE_LOOKUPS.inc(result="miss")
+                folder = resolve(service, folder_name, parent_id)
+                self.add(folder, folder_name, parent_id)
+                return folder
+        finally:
+            with self._lock:
+                if self._key_locks.get(key) is key_lock:
+                    del self._key_locks[key]
+
+    def add(self, folder, folder_name, parent_id=None):
+        with self._lock:
+            self._entries[(parent_id, folder_name)] = (folder, time.monotonic() + self.ttl)
+
+    def invalidate(self, folder_id):
+        """Silinen klasörü ve altındaki klasörleri önbellekten çıkar"""
+        with self._lock:
+            removed = {folder_id}
+            changed = True
+            while changed:
+                changed = False
+                for (parent_id, _), (folder, _) in list(self._entries.items()):
+                    if parent_id in removed and folder.get('id') not in removed:
+                        removed.add(folder.get('id'))
+                        changed = True
+            for key, (folder, _) in list(self._entries.items()):
+                if folder.get('id') in removed or key[0] in removed:
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+# Süreç genelinde paylaşılan önbellek
+folder_cache = FolderCache()
@@ -0,0 +1,373 @@
+# drive_service/storage.py
+"""Fotoğrafların saklandığı depolama arka uçları.
+
+Aynı arayüzü (klasör, yükleme, kopyalama, paylaşım, silme ve link) üç arka
+uç sağlar; hangisinin kullanılacağı STORAGE_BACKEND ile seçilir:
+
+- drive: Google Drive (varsayılan)
+- local: yerel dosya sistemi; ağ gerektirmez, benchmark ve geliştirme için
+- s3: S3 uyumlu nesne deposu (AWS S3, yerelde MinIO)
+
+Klasör ve dosya ID'leri arka uca özgüdür ve sadece aynı arka uçla
+kullanılmalıdır: Drive'da Drive ID'si, yerelde kök dizine göre göreli yol,
+S3'te nesne anahtarı (klasörler için anahtar öneki).
+"""
+
+import mimetypes
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from urllib.parse import quote
+
+from bot.metrics import timed
+from drive_service import uploader
+from drive_service.folder_cache import folder_cache
+
+# drive, local veya s3
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "drive").lower()
+# Yerel arka ucun kök dizini
+STORAGE_LOCAL_PATH = os.getenv("STORAGE_LOCAL_PATH", "storage")
+# S3 uyumlu depo: kova, uç nokta (MinIO için http://localhost:9000), bölge ve anahtar öneki.
+# Kimlik bilgileri boto3'ün standart kaynaklarından (AWS_ACCESS_KEY_ID vb.) okunur.
+STORAGE_S3_BUCKET = os.getenv("STORAGE_S3_BUCKET")
+STORAGE_S3_ENDPOINT_URL = os.getenv("STORAGE_S3_ENDPOINT_URL")
+STORAGE_S3_REGION = os.getenv("STORAGE_S3_REGION")
+STORAGE_S3_PREFIX = os.getenv("STORAGE_S3_PREFIX", "ilanlar").strip("/")
+# Yerel ve S3 arka uçlarında linklerin başına eklenecek genel adres
+# (ör. https://cdn.example.com); boşsa yerelde file://, S3'te uç nokta adresi kullanılır
+STORAGE_PUBLIC_BASE_URL = os.getenv("STORAGE_PUBLIC_BASE_URL", "").rstrip("/")
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def _safe_name(name: str) -> str:
+    """Klasör/dosya adını tek bir yol parçasına çevir"""
+    name = (name or "").replace("/", "-").replace("\\", "-").strip()
+    if name in ("", ".", ".."):
+        name = "_"
+    return name
+
+
+def _guess_mimetype(filename: str, mimetype: str = None) -> str:
+    if mimetype:
+        return mimetype
+    guessed, _ = mimetypes.guess_type(filename)
+    return guessed or 'application/octet-stream'
+
+
+class StorageBackend:
+    """Depolama arka uçlarının ortak arayüzü"""
+
+    name = None
+
+    @property
+    def root_folder_id(self):
+        """İlan klasörlerinin oluşturulduğu ana klasör"""
+        raise NotImplementedError
+
+    def get_or_create_folder(self, folder_name: str, parent_id=None) -> str:
+        """Klasörü bul veya oluştur, ID'sini döndür"""
+        raise NotImplementedError
+
+    def create_folder(self, folder_name: str, parent_id=None, public: bool = False) -> str:
+        """Yeni klasör oluştur; public ise bağlantıya sahip herkes görebilir"""
+        raise NotImplementedError
+
+    def upload_bytes(self, data: bytes, filename: str, mimetype: str = None, parent_id=None) -> str:
+        """Veriyi paylaşım ayarı yapmadan yükle, dosya ID'sini döndür"""
+        raise NotImplementedError
+
+    def copy_file(self, file_id, parent_id, name: str = None) -> str:
+        """Dosyayı veriyi tekrar göndermeden başka klasöre kopyala"""
+        raise NotImplementedError
+
+    def create_shortcut(self, target_id, parent_id, name: str) -> str:
+        """Dosyaya başka klasörden bağlantı ver; desteklenmiyorsa kopyalanır"""
+        return self.copy_file(target_id, parent_id, name)
+
+    def share(self, file_ids: list, inherit: bool = False) -> list:
+        """Dosyaları herkese açık yap, linklerini döndür.
+
+        inherit=True: dosyalar create_folder(public=True) ile oluşturulmuş bir
+        klasörde, paylaşım klasörden devralınabilir. Sonuç listesi file_ids ile
+        aynı sıradadır; ID'si None olan veya paylaşılamayan dosyalar için None
+        döner.
+        """
+        return [self.file_link(file_id) if file_id else None for file_id in file_ids]
+
+    def delete(self, item_id):
+        """Dosyayı veya klasörü (içindekilerle birlikte) sil"""
+        raise NotImplementedError
+
+    def file_link(self, file_id) -> str:
+        raise NotImplementedError
+
+    def folder_link(self, folder_id) -> str:
+        raise NotImplementedError
+
+
+class DriveStorage(StorageBackend):
+    """Google Drive arka ucu; drive_service.uploader üzerinden çalışır"""
+
+    name = "drive"
+
+    def _service(self):
+        return uploader.get_drive_service()
+
+    @property
+    def root_folder_id(self):
+        main_folder_id = os.getenv("GOOGLE_DRIVE_MAIN_FOLDER_ID")
+        if not main_folder_id:
+            raise ValueError("GOOGLE_DRIVE_MAIN_FOLDER_ID bulunamadı")
+        return main_folder_id
+
+    def get_or_create_folder(self, folder_name, parent_id=None):
+        return uploader.get_or_create_folder(self._service(), folder_name, parent_id).get('id')
+
+    def create_folder(self, folder_name, parent_id=None, public=False):
+        service = self._service()
+        folder_metadata = {'name': folder_name, 'mimeType': 'application/vnd.google-apps.folder'}
+        if parent_id:
+            folder_metadata['parents'] = [parent_id]
+        folder_id = service.files().create(body=folder_metadata, fields='id').execute().get('id')
+        if public:
+            # Klasörü herkese açık yap; içine yüklenen dosyalar paylaşımı devralır
+            with timed("drive_permission", "drive"):
+                service.permissions().create(fileId=folder_id, body=uploader._public_permission()).execute()
+        return folder_id
+
+    def upload_bytes(self, data, filename, mimetype=None, parent_id=None):
+        return uploader.upload_bytes(self._service(), data, filename, mimetype, parent_id)
+
+    def copy_file(self, file_id, parent_id, name=None):
+        return uploader.copy_file(self._service(), file_id, parent_id, name)
+
+    def create_shortcut(self, target_id, parent_id, name):
+        return uploader.create_shortcut(self._service(), target_id, parent_id, name)
+
+    def share(self, file_ids, inherit=False):
+        return uploader.share_files(self._service(), file_ids, inherit=inherit)
+
+    def delete(self, item_id):
+        with timed("drive_delete", "drive"):
+            self._service().files().delete(fileId=item_id).execute()
+        folder_cache.invalidate(item_id)
+
+    def file_link(self, file_id):
+        return uploader.file_link(file_id)
+
+    def folder_link(self, folder_id):
+        return f"https://drive.google.com/drive/folders/{folder_id}"
+
+
+class LocalStorage(StorageBackend):
+    """Yerel dosya sistemi arka ucu; ID'ler kök dizine göre göreli yollardır"""
+
+    name = "local"
+
+    def __init__(self, root: str = STORAGE_LOCAL_PATH, public_base_url: str = STORAGE_PUBLIC_BASE_URL):
+        self.root = os.path.abspath(root)
+        self.public_base_url = public_base_url
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    @property
+    def root_folder_id(self):
+        return ""
+
+    def _path(self, item_id) -> str:
+        path = os.path.abspath(os.path.join(self.root, item_id or ""))
+        if path != self.root and not path.startswith(self.root + os.sep):
+            raise ValueError(f"Depolama kökü dışında yol: {item_id}")
+        return path
+
+    def _id(self, path: str) -> str:
+        return os.path.relpath(path, self.root).replace(os.sep, "/")
+
+    def get_or_create_folder(self, folder_name, parent_id=None):
+        path = os.path.join(self._path(parent_id), _safe_name(folder_name))
+        os.makedirs(path, exist_ok=True)
+        return self._id(path)
+
+    def create_folder(self, folder_name, parent_id=None, public=False):
+        # Aynı adlı klasör varsa Drive'daki gibi ayrı bir klasör aç
+        parent = self._path(parent_id)
+        base = _safe_name(folder_name)
+        with self._lock:
+            path = os.path.join(parent, base)
+            suffix = 1
+            while os.path.exists(path):
+                suffix += 1
+                path = os.path.join(parent, f"{base} ({suffix})")
+            os.makedirs(path)
+        return self._id(path)
+
+    def _reserve(self, parent: str, filename: str) -> str:
+        """Klasörde kullanılmayan bir dosya yolu ayır"""
+        stem, ext = os.path.splitext(_safe_name(filename))
+        with self._lock:
+            path = os.path.join(parent, stem + ext)
+            while os.path.exists(path):
+                path = os.path.join(parent, f"{stem}_{uuid.uuid4().hex[:8]}{ext}")
+            # Yer tutucu; başka bir thread aynı adı almasın
+            open(path, "xb").close()
+        return path
+
+    def upload_bytes(self, data, filename, mimetype=None, parent_id=None):
+        parent = self._path(parent_id)
+        os.makedirs(parent, exist_ok=True)
+        path = self._reserve(parent, filename)
+        with timed("storage_upload", "local"):
+            # Yarım yazılmış dosya görünmesin diye önce geçici dosyaya yaz
+            fd, tmp_path = tempfile.mkstemp(dir=parent, prefix=".upload-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except Exception:
+                os.unlink(tmp_path)
+                os.unlink(path)
+                raise
+        return self._id(path)
+
+    def copy_file(self, file_id, parent_id, name=None):
+        source = self._path(file_id)
+        path = self._reserve(self._path(parent_id), name or os.path.basename(source))
+        with timed("storage_copy", "local"):
+            shutil.copyfile(source, path)
+        return self._id(path)
+
+    def delete(self, item_id):
+        path = self._path(item_id)
+        if path == self.root:
+            raise ValueError("Depolama kökü silinemez")
+        with timed("storage_delete", "local"):
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+
+    def file_link(self, file_id):
+        if self.public_base_url:
+            return f"{self.public_base_url}/{quote(file_id)}"
+        return "file://" + quote(self._path(file_id))
+
+    def folder_link(self, folder_id):
+        return self.file_link(folder_id)
+
+
+class S3Storage(StorageBackend):
+    """S3 uyumlu nesne deposu arka ucu.
+
+    Klasörler anahtar önekleridir (ayrı nesne oluşturulmaz), ID'ler nesne
+    anahtarlarıdır. Linklerin açılabilmesi için kovada genel okuma izni
+    (bucket policy) veya önünde bir CDN olmalıdır.
+    """
+
+    name = "s3"
+
+    def __init__(self, bucket: str = STORAGE_S3_BUCKET, endpoint_url: str = STORAGE_S3_ENDPOINT_URL,
+                 region: str = STORAGE_S3_REGION, prefix: str = STORAGE_S3_PREFIX,
+                 public_base_url: str = STORAGE_PUBLIC_BASE_URL):
+        if not bucket:
+            raise ValueError("STORAGE_S3_BUCKET bulunamadı")
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url
+        self.region = region
+        self.prefix = prefix
+        self.public_base_url = public_base_url
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    def client(self):
+        """boto3 istemcisi (thread-safe, bir kez oluşturulur)"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    # boto3 opsiyonel ve ağır; sadece bu arka uç seçilince yüklenir
+                    import boto3
+
+                    self._client = boto3.client("s3", endpoint_url=self.endpoint_url, region_name=self.region)
+        return self._client
+
+    @property
+    def root_folder_id(self):
+        return self.prefix
+
+    def _join(self, parent_id, name):
+        name = _safe_name(name)
+        return f"{parent_id}/{name}" if parent_id else name
+
+    def get_or_create_folder(self, folder_name, parent_id=None):
+        return self._join(parent_id, folder_name)
+
+    def create_folder(self, folder_name, parent_id=None, public=False):
+        # Önekler çakışmasın diye kısa bir ek kullanılır
+        return self._join(parent_id, f"{_safe_name(folder_name)} {uuid.uuid4().hex[:8]}")
+
+    def upload_bytes(self, data, filename, mimetype=None, parent_id=None):
+        stem, ext = os.path.splitext(_safe_name(filename))
+        key = self._join(parent_id, f"{stem}_{uuid.uuid4().hex[:8]}{ext}")
+        with timed("storage_upload", "s3"):
+            self.client().put_object(
+                Bucket=self.bucket, Key=key, Body=data, ContentType=_guess_mimetype(filename, mimetype)
+            )
+        return key
+
+    def copy_file(self, file_id, parent_id, name=None):
+        stem, ext = os.path.splitext(_safe_name(name or file_id.rsplit("/", 1)[-1]))
+        key = self._join(parent_id, f"{stem}_{uuid.uuid4().hex[:8]}{ext}")
+        with timed("storage_copy", "s3"):
+            self.client().copy_object(Bucket=self.bucket, Key=key, CopySource={"Bucket": self.bucket, "Key": file_id})
+        return key
+
+    def delete(self, item_id):
+        if not item_id or item_id == self.prefix:
+            raise ValueError("Depolama kökü silinemez")
+        client = self.client()
+        with timed("storage_delete", "s3"):
+            # Klasörse altındaki tüm nesneleri 1000'erli gruplarla sil
+            paginator = client.get_paginator("list_objects_v2")
+            for page in paginator.paginate(Bucket=self.bucket, Prefix=f"{item_id}/"):
+                keys = [{"Key": item["Key"]} for item in page.get("Contents", [])]
+                if keys:
+                    client.delete_objects(Bucket=self.bucket, Delete={"Objects": keys, "Quiet": True})
+            client.delete_object(Bucket=self.bucket, Key=item_id)
+
+    def file_link(self, file_id):
+        if self.public_base_url:
+            return f"{self.public_base_url}/{quote(file_id)}"
+        if self.endpoint_url:
+            return f"{self.endpoint_url.rstrip('/')}/{self.bucket}/{quote(file_id)}"
+        return f"https://{self.bucket}.s3.amazonaws.com/{quote(file_id)}"
+
+    def folder_link(self, folder_id):
+        return self.file_link(f"{folder_id}/")
+
+
+BACKENDS = {
+    "drive": DriveStorage,
+    "local": LocalStorage,
+    "s3": S3Storage,
+}
+
+
+def create_storage(backend: str = STORAGE_BACKEND) -> StorageBackend:
+    """Adı verilen depolama arka ucunu oluştur"""
+    try:
+        return BACKENDS[backend]()
+    except KeyError:
+        raise ValueError(f"Bilinmeyen STORAGE_BACKEND: {backend} (drive, local veya s3 olmalı)") from None
+
+
+def get_storage() -> StorageBackend:
+    """Süreç genelinde paylaşılan depolama arka ucu"""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = create_storage()
+    return _storage
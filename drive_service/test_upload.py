@@ -1,6 +1,11 @@
 # drive_service/test_upload.py
 
-from uploader import upload_file_to_drive
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from drive_service.uploader import upload_file_to_drive
 
 # Yüklemek istediğin dosya adı (aynı klasörde olduğunu varsayıyoruz)
 file_path = "drive_service/ev1.jpg"
@@ -1,25 +1,87 @@
 import os
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
 from dotenv import load_dotenv
 import mimetypes
+import io
+import threading
+from bot.metrics import timed
+from drive_service.folder_cache import folder_cache
 
 load_dotenv()
 
 SCOPES = ['https://www.googleapis.com/auth/drive.file']
 
+# Bellekten yüklemede parça boyutu (256 KB'ın katı olmalı)
+UPLOAD_CHUNK_SIZE = int(os.getenv("DRIVE_UPLOAD_CHUNK_SIZE", 4 * 1024 * 1024))
+# Drive isteklerinde soket zaman aşımı (saniye)
+DRIVE_HTTP_TIMEOUT = float(os.getenv("DRIVE_HTTP_TIMEOUT", 60))
+
+# Yüklenen dosyaların paylaşımı: batch (tek batch isteği) veya per_file
+DRIVE_SHARING_MODE = os.getenv("DRIVE_SHARING_MODE", "batch")
+# Drive tek batch isteğinde en fazla 100 çağrı kabul eder
+DRIVE_BATCH_SIZE = min(int(os.getenv("DRIVE_BATCH_SIZE", 100)), 100)
+
+_credentials = None
+_credentials_lock = threading.Lock()
+_discovery_doc = None
+_local = threading.local()
+
+def get_drive_credentials():
+    """Service account kimlik bilgisini süreç başına bir kez yükle.
+
+    Token süresi dolduğunda AuthorizedHttp tarafından otomatik yenilenir.
+    """
+    global _credentials
+    if _credentials is None:
+        with _credentials_lock:
+            if _credentials is None:
+                # Google istemci kütüphaneleri ağır; sadece Drive gerçekten kullanılınca yüklenir
+                from google.oauth2 import service_account
+
+                creds_path = os.getenv("GOOGLE_DRIVE_CREDENTIALS_FILE")
+                _credentials = service_account.Credentials.from_service_account_file(creds_path, scopes=SCOPES)
+    return _credentials
+
+def _get_discovery_doc():
+    """Kütüphaneyle gelen Drive v3 discovery belgesi (ağdan indirilmez)"""
+    global _discovery_doc
+    if _discovery_doc is None:
+        from googleapiclient.discovery_cache import get_static_doc
+
+        _discovery_doc = get_static_doc('drive', 'v3')
+    return _discovery_doc
+
 def get_drive_service():
-    creds_path = os.getenv("GOOGLE_DRIVE_CREDENTIALS_FILE")
-    creds = service_account.Credentials.from_service_account_file(creds_path, scopes=SCOPES)
-    return build('drive', 'v3', credentials=creds)
+    """Thread'e ait Drive servisini döndür.
+
+    httplib2.Http thread-safe olmadığından her thread kendi bağlantısını ve
+    servis nesnesini kullanır; kimlik bilgisi ve discovery belgesi paylaşılır.
+    """
+    service = getattr(_local, "service", None)
+    if service is None:
+        import httplib2
+        from google_auth_httplib2 import AuthorizedHttp
+        from googleapiclient.discovery import build, build_from_document
+
+        http = AuthorizedHttp(get_drive_credentials(), http=httplib2.Http(timeout=DRIVE_HTTP_TIMEOUT))
+        doc = _get_discovery_doc()
+        if doc:
+            service = build_from_document(doc, http=http)
+        else:
+            service = build('drive', 'v3', http=http, static_discovery=True)
+        _local.service = service
+    return service
 
 def get_or_create_folder(service, folder_name, parent_id=None):
+    """Klasörü bul veya oluştur; sonuç (üst klasör, ad) için önbelleğe alınır"""
+    return folder_cache.get_or_create(service, folder_name, parent_id, _find_or_create_folder)
+
+def _find_or_create_folder(service, folder_name, parent_id=None):
     # Klasör var mı kontrol et
     query = f"mimeType='application/vnd.google-apps.folder' and name='{folder_name}' and trashed=false"
     if parent_id:
         query += f" and '{parent_id}' in parents"
-    results = service.files().list(q=query, fields="files(id, name)").execute()
+    with timed("drive_folder_lookup", "drive"):
+        results = service.files().list(q=query, fields="files(id, name)").execute()
     items = results.get('files', [])
     if items:
         return items[0]  # Tüm folder nesnesini döndür
@@ -35,6 +97,8 @@ def get_or_create_folder(service, folder_name, parent_id=None):
     return folder  # Tüm folder nesnesini döndür
 
 def upload_file_to_drive(filepath, filename, parent_folder_id=None):
+    from googleapiclient.http import MediaFileUpload
+
     service = get_drive_service()
 
     file_metadata = {'name': filename}
@@ -54,20 +118,128 @@ def upload_file_to_drive(filepath, filename, parent_folder_id=None):
     ).execute()
 
     file_id = file.get('id')
+    return share_files(service, [file_id])[0]
+
+def upload_bytes_to_drive(data: bytes, filename: str, mimetype: str = None, parent_folder_id=None):
+    """Bellekteki veriyi geçici dosya yazmadan Drive'a yükle, linkini döndür"""
+    service = get_drive_service()
+    file_id = upload_bytes(service, data, filename, mimetype, parent_folder_id)
+    return share_files(service, [file_id])[0]
+
+def upload_bytes(service, data: bytes, filename: str, mimetype: str = None, parent_folder_id=None):
+    """Bellekteki veriyi paylaşım ayarı yapmadan yükle, dosya ID'sini döndür"""
+    from googleapiclient.http import MediaIoBaseUpload
+
+    file_metadata = {'name': filename}
+    if parent_folder_id:
+        file_metadata['parents'] = [parent_folder_id]
+    if mimetype is None:
+        mimetype, _ = mimetypes.guess_type(filename)
+    if mimetype is None:
+        mimetype = 'application/octet-stream'
 
-    # Dosyanın paylaşımını "herkese açık" yap
-    permission = {
+    # Büyük dosyalar parça parça (resumable), küçükler tek istekte yüklenir
+    media = MediaIoBaseUpload(
+        io.BytesIO(data),
+        mimetype=mimetype,
+        chunksize=UPLOAD_CHUNK_SIZE,
+        resumable=len(data) > UPLOAD_CHUNK_SIZE
+    )
+
+    with timed("drive_upload", "drive"):
+        file = service.files().create(
+            body=file_metadata,
+            media_body=media,
+            fields='id'
+        ).execute()
+
+    return file.get('id')
+
+def copy_file(service, file_id, parent_folder_id, name=None):
+    """Dosyanın Drive içinde sunucu tarafı kopyasını oluştur (veri yeniden yüklenmez)"""
+    body = {'parents': [parent_folder_id]}
+    if name:
+        body['name'] = name
+    with timed("drive_copy", "drive"):
+        file = service.files().copy(fileId=file_id, body=body, fields='id').execute()
+    return file.get('id')
+
+def create_shortcut(service, target_id, parent_folder_id, name):
+    """Başka bir klasördeki dosyaya kısayol oluştur"""
+    body = {
+        'name': name,
+        'mimeType': 'application/vnd.google-apps.shortcut',
+        'shortcutDetails': {'targetId': target_id},
+        'parents': [parent_folder_id]
+    }
+    with timed("drive_shortcut", "drive"):
+        file = service.files().create(body=body, fields='id').execute()
+    return file.get('id')
+
+def file_link(file_id):
+    """Dosyanın görüntüleme linki"""
+    return f"https://drive.google.com/file/d/{file_id}/view?usp=sharing"
+
+def _public_permission():
+    return {
         'type': 'anyone',
         'role': 'reader'
     }
-    service.permissions().create(fileId=file_id, body=permission).execute()
 
-    # Doğrudan erişilebilir link üret
-    return f"https://drive.google.com/file/d/{file_id}/view?usp=sharing"
+def share_files(service, file_ids: list, inherit: bool = False) -> list:
+    """Dosyaları DRIVE_SHARING_MODE'a göre herkese açık yap, linklerini döndür.
+
+    batch: izinler tek batch isteğiyle verilir. per_file: her dosya için ayrı
+    istek atılır. inherit=True sadece dosyaların herkese açık oluşturulmuş bir
+    klasörde olduğu bilindiğinde verilmeli; o zaman istek atılmaz, klasörün
+    paylaşımı dosyalara geçer. Sonuç listesi file_ids ile aynı sıradadır;
+    izni verilemeyen dosyalar için None döner.
+    """
+    ids = [file_id for file_id in file_ids if file_id]
+    failed = set()
+    if ids and not inherit:
+        if DRIVE_SHARING_MODE == "batch" and len(ids) > 1:
+            errors = execute_batch(service, [
+                service.permissions().create(fileId=file_id, body=_public_permission(), fields='id')
+                for file_id in ids
+            ])
+            # Batch içinde başarısız olanları tek tek tekrar dene
+            retry_ids = [file_id for file_id, error in zip(ids, errors) if error is not None]
+        else:
+            retry_ids = ids
+        for file_id in retry_ids:
+            try:
+                with timed("drive_permission", "drive"):
+                    service.permissions().create(fileId=file_id, body=_public_permission()).execute()
+            except Exception as e:
+                print(f"Drive paylaşım hatası ({file_id}): {str(e)}")
+                failed.add(file_id)
+    return [file_link(file_id) if file_id and file_id not in failed else None for file_id in file_ids]
+
+def execute_batch(service, requests: list) -> list:
+    """İstekleri Drive batch istekleriyle gönder.
+
+    Sonuç listesi requests ile aynı sıradadır; başarılı istekler için None,
+    başarısızlar için hata nesnesi döner.
+    """
+    errors = [None] * len(requests)
+
+    def callback(request_id, response, exception):
+        if exception is not None:
+            errors[int(request_id)] = exception
+
+    for start in range(0, len(requests), DRIVE_BATCH_SIZE):
+        batch = service.new_batch_http_request(callback=callback)
+        for index, request in enumerate(requests[start:start + DRIVE_BATCH_SIZE], start=start):
+            batch.add(request, request_id=str(index))
+        with timed("drive_batch", "drive"):
+            batch.execute()
+    return errors
 
 def upload_multiple_photos(folder_path: str, parent_folder_id: str = None) -> list:
-    """Klasördeki tüm fotoğrafları Drive'a yükle"""
-    service = get_drive_service()
+    """Klasördeki tüm fotoğrafları eşzamanlı ve kaldığı yerden devam edebilir şekilde yükle"""
+    from drive_service.bulk_upload import upload_files
+
     photo_links = []
     
     # Klasör yolunu normalize et
@@ -79,56 +251,20 @@ def upload_multiple_photos(folder_path: str, parent_folder_id: str = None) -> li
         print(f"HATA: Klasör bulunamadı: {folder_path}")
         return photo_links
         
-    files = [f for f in os.listdir(folder_path) if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
+    files = sorted(f for f in os.listdir(folder_path) if f.lower().endswith(('.jpg', '.jpeg', '.png')))
     print(f"Yüklenecek dosyalar: {files}")
 
-    for f in files:
-        full_path = os.path.join(folder_path, f)
-        print(f"İşleniyor: {full_path}")
-        
-        if not os.path.exists(full_path):
-            print(f"HATA: Dosya bulunamadı: {full_path}")
-            continue
-            
-        file_metadata = {'name': f}
-        if parent_folder_id:
-            file_metadata['parents'] = [parent_folder_id]
-
-        mimetype, _ = mimetypes.guess_type(full_path)
-        if mimetype is None:
-            mimetype = 'image/jpeg'  # varsayılan olarak jpeg
-
-        try:
-            media = MediaFileUpload(full_path, mimetype=mimetype, resumable=True)
-            print(f"Dosya yükleniyor: {f}")
-
-            # Dosyayı Drive'a yükle
-            file = service.files().create(
-                body=file_metadata,
-                media_body=media,
-                fields='id'
-            ).execute()
-
-            file_id = file.get('id')
-            print(f"Dosya yüklendi, ID: {file_id}")
-
-            # Dosyanın paylaşımını "herkese açık" yap
-            permission = {
-                'type': 'anyone',
-                'role': 'reader'
-            }
-            service.permissions().create(fileId=file_id, body=permission).execute()
-            print(f"Dosya paylaşımı ayarlandı: {file_id}")
-
-            # Doğrudan erişilebilir link üret
-            link = f"https://drive.google.com/file/d/{file_id}/view?usp=sharing"
-            photo_links.append({"url": link})
-            print(f"Görsel başarıyla yüklendi: {f}")
-        except Exception as e:
-            print(f"Görsel yükleme hatası ({f}): {str(e)}")
-            print(f"Hata detayı: {type(e).__name__}")
-            continue
+    file_ids, stats = upload_files([os.path.join(folder_path, f) for f in files], parent_folder_id)
+    print(
+        f"Yükleme tamamlandı: {stats['files']} dosya ({stats['skipped']} önceden yüklenmiş, "
+        f"{stats['resumed']} devam ettirilen, {stats['failed']} hatalı), "
+        f"{stats['bytes'] / (1024 * 1024):.1f} MB, {stats['elapsed_seconds']} sn, {stats['mb_per_second']} MB/sn"
+    )
 
+    # Dosyaların paylaşımını "herkese açık" yap (DRIVE_SHARING_MODE'a göre)
+    for link in share_files(get_drive_service(), file_ids):
+        if link:
+            photo_links.append({"url": link})
     return photo_links
 
 def delete_folder(service, folder_name):
@@ -162,6 +298,7 @@ def delete_folder(service, folder_name):
         
         # Klasörü sil
         service.files().delete(fileId=folder_id).execute()
+        folder_cache.invalidate(folder_id)
         return True, "Klasör başarıyla silindi"
         
     except Exception as e:
@@ -189,6 +326,7 @@ def delete_folder_by_id(service, folder_id):
     """Klasörü id ile sil"""
     try:
         service.files().delete(fileId=folder_id).execute()
+        folder_cache.invalidate(folder_id)
         return True, "Klasör başarıyla silindi"
     except Exception as e:
         print(f"Drive klasörü silme hatası: {str(e)}")
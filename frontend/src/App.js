@@ -10,12 +10,18 @@ import {
   XMarkIcon
 } from '@heroicons/react/24/outline';
 
+const PAGE_SIZE = 24;
+// Arama kutusunda yazarken her tuşta istek atılmaması için bekleme süresi (ms)
+const SEARCH_DEBOUNCE_MS = 300;
+
 function App() {
   const [ilanlar, setIlanlar] = useState([]);
-  const [filteredIlanlar, setFilteredIlanlar] = useState([]);
+  const [total, setTotal] = useState(0);
+  const [page, setPage] = useState(0);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [searchTerm, setSearchTerm] = useState('');
+  const [debouncedSearchTerm, setDebouncedSearchTerm] = useState('');
   const [showFilters, setShowFilters] = useState(false);
   const [filters, setFilters] = useState({
     minPrice: '',
@@ -26,61 +32,46 @@ function App() {
   });
 
   useEffect(() => {
-    fetchIlanlar();
-  }, []);
+    const timer = setTimeout(() => setDebouncedSearchTerm(searchTerm.trim()), SEARCH_DEBOUNCE_MS);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
+
+  // Arama veya filtre değişince ilk sayfaya dön
+  useEffect(() => {
+    setPage(0);
+  }, [debouncedSearchTerm, filters]);
 
   useEffect(() => {
-    filterIlanlar();
-  }, [ilanlar, searchTerm, filters]);
+    // Filtreleme ve sayfalama sunucuda yapılır; sadece gösterilen sayfa istenir
+    const controller = new AbortController();
+    fetchIlanlar(controller.signal);
+    return () => controller.abort();
+  }, [debouncedSearchTerm, filters, page]);
+
+  const fetchIlanlar = async (signal) => {
+    const params = { skip: page * PAGE_SIZE, limit: PAGE_SIZE };
+    if (debouncedSearchTerm) params.q = debouncedSearchTerm;
+    if (filters.minPrice) params.min_fiyat = filters.minPrice;
+    if (filters.maxPrice) params.max_fiyat = filters.maxPrice;
+    if (filters.odaSayisi) params.oda_sayisi = filters.odaSayisi;
+    if (filters.minMetrekare) params.min_metrekare = filters.minMetrekare;
+    if (filters.maxMetrekare) params.max_metrekare = filters.maxMetrekare;
 
-  const fetchIlanlar = async () => {
     try {
       const apiUrl = process.env.REACT_APP_API_URL || "http://localhost:8000";
-      const response = await axios.get(`${apiUrl}/ilan`);
-      setIlanlar(response.data);
-      setFilteredIlanlar(response.data);
+      const response = await axios.get(`${apiUrl}/ilan/`, { params, signal });
+      setIlanlar(response.data.items);
+      setTotal(response.data.total);
+      setError(null);
       setLoading(false);
     } catch (err) {
+      if (axios.isCancel(err)) return;
       setError('İlanlar yüklenirken bir hata oluştu.');
       setLoading(false);
     }
   };
 
-  const filterIlanlar = () => {
-    let filtered = [...ilanlar];
-
-    // Arama filtresi
-    if (searchTerm) {
-      filtered = filtered.filter(ilan => 
-        ilan.baslik.toLowerCase().includes(searchTerm.toLowerCase()) ||
-        ilan.aciklama.toLowerCase().includes(searchTerm.toLowerCase()) ||
-        ilan.mahalle.toLowerCase().includes(searchTerm.toLowerCase())
-      );
-    }
-
-    // Fiyat filtresi
-    if (filters.minPrice) {
-      filtered = filtered.filter(ilan => ilan.fiyat >= Number(filters.minPrice));
-    }
-    if (filters.maxPrice) {
-      filtered = filtered.filter(ilan => ilan.fiyat <= Number(filters.maxPrice));
-    }
-
-    // Oda sayısı filtresi
-    if (filters.odaSayisi) {
-      filtered = filtered.filter(ilan => ilan.oda_sayisi === filters.odaSayisi);
-    }
-
-    // Metrekare filtresi
-    if (filters.minMetrekare) {
-      filtered = filtered.filter(ilan => ilan.metrekare >= Number(filters.minMetrekare));
-    }
-    if (filters.maxMetrekare) {
-      filtered = filtered.filter(ilan => ilan.metrekare <= Number(filters.maxMetrekare));
-    }
-
-    setFilteredIlanlar(filtered);
-  };
+  const pageCount = Math.ceil(total / PAGE_SIZE);
 
   const clearFilters = () => {
     setFilters({
@@ -213,7 +204,7 @@ function App() {
       {/* Main Content */}
       <main className="max-w-7xl mx-auto py-6 sm:px-6 lg:px-8">
         <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
-          {filteredIlanlar.map((ilan) => (
+          {ilanlar.map((ilan) => (
             <div key={ilan.id} className="bg-white rounded-lg shadow-md overflow-hidden hover:shadow-lg transition-shadow duration-300">
               {/* İlan Detayları */}
               <div className="p-6">
@@ -255,11 +246,36 @@ function App() {
         </div>
 
         {/* Sonuç Bulunamadı */}
-        {filteredIlanlar.length === 0 && (
+        {total === 0 && (
           <div className="text-center py-12">
             <p className="text-gray-500 text-lg">Arama kriterlerinize uygun ilan bulunamadı.</p>
           </div>
         )}
+
+        {/* Sayfalama */}
+        {pageCount > 1 && (
+          <div className="flex justify-between items-center mt-8 px-4 sm:px-0">
+            <span className="text-sm text-gray-600">
+              {page * PAGE_SIZE + 1}-{Math.min((page + 1) * PAGE_SIZE, total)} / {total} ilan
+            </span>
+            <div className="flex space-x-2">
+              <button
+                onClick={() => setPage(page - 1)}
+                disabled={page === 0}
+                className="px-4 py-2 bg-white border border-gray-300 rounded-lg hover:bg-gray-50 disabled:opacity-50 disabled:cursor-not-allowed"
+              >
+                Önceki
+              </button>
+              <button
+                onClick={() => setPage(page + 1)}
+                disabled={page + 1 >= pageCount}
+                className="px-4 py-2 bg-white border border-gray-300 rounded-lg hover:bg-gray-50 disabled:opacity-50 disabled:cursor-not-allowed"
+              >
+                Sonraki
+              </button>
+            </div>
+          </div>
+        )}
       </main>
     </div>
   );
@@ -1,5 +1,92 @@
 # migrate.py
+import re
+
+from sqlalchemy import inspect, text
+
 from backend.database import engine
-from backend.models import Base
+from backend.models import Base, Ilan, PhotoUploadSession
+
+# Eski kayıtların drive_link alanından klasör ID'sini çıkarmak için
+FOLDER_LINK_RE = re.compile(r"/folders/([A-Za-z0-9_-]+)")
+# /sil ve GET /ilan?q= aramalarındaki ILIKE '%...%' sorgularını karşılayan trigram
+# indeksleri (sadece PostgreSQL)
+TRIGRAM_INDEXES = {
+    "ix_emlak_ilanlar_baslik_trgm": "baslik",
+    "ix_emlak_ilanlar_mahalle_trgm": "mahalle",
+    "ix_emlak_ilanlar_aciklama_trgm": "aciklama",
+}
+
+
+def add_missing_columns(conn):
+    """create_all mevcut tablolara sütun eklemez; yeni sütunları ekle"""
+    table = Ilan.__table__
+    existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        column_type = column.type.compile(dialect=conn.dialect)
+        default = f" DEFAULT {column.server_default.arg}" if column.server_default is not None else ""
+        null = "" if column.nullable else " NOT NULL"
+        conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}{default}{null}"))
+        print(f"Sütun eklendi: {table.name}.{column.name}")
+    for index in table.indexes:
+        index.create(conn, checkfirst=True)
+
+
+def create_trigram_indexes(conn):
+    if conn.dialect.name != "postgresql":
+        return
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    for name, column in TRIGRAM_INDEXES.items():
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS {name} ON {Ilan.__tablename__} USING gin ({column} gin_trgm_ops)"
+        ))
+
+
+def backfill_folder_ids(conn):
+    """drive_folder_id'si boş eski ilanlar için klasör ID'sini drive_link'ten doldur"""
+    rows = conn.execute(text(
+        f"SELECT id, drive_link FROM {Ilan.__tablename__} "
+        "WHERE drive_folder_id IS NULL AND drive_link IS NOT NULL"
+    )).fetchall()
+    updates = []
+    for ilan_id, drive_link in rows:
+        match = FOLDER_LINK_RE.search(drive_link)
+        if match:
+            updates.append({"id": ilan_id, "folder_id": match.group(1)})
+    if updates:
+        conn.execute(
+            text(f"UPDATE {Ilan.__tablename__} SET drive_folder_id = :folder_id WHERE id = :id"),
+            updates
+        )
+        print(f"Klasör ID'si doldurulan ilan: {len(updates)}")
+
+
+def make_photo_session_user_unique(conn):
+    """Gönderici başına tek fotoğraf oturumu: fazlaları sil, user_id indeksini tekil yap"""
+    table = PhotoUploadSession.__table__
+    index = next(index for index in table.indexes if [c.name for c in index.columns] == ["user_id"])
+    existing = {i["name"]: i for i in inspect(conn).get_indexes(table.name)}.get(index.name)
+    if existing and existing["unique"]:
+        return
+    result = conn.execute(text(
+        f"DELETE FROM {table.name} WHERE id NOT IN (SELECT MAX(id) FROM {table.name} GROUP BY user_id)"
+    ))
+    if result.rowcount:
+        print(f"Tekrarlanan fotoğraf oturumu silindi: {result.rowcount}")
+    if existing:
+        index.drop(conn)
+    index.create(conn)
+
+
+def main():
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        add_missing_columns(conn)
+        create_trigram_indexes(conn)
+        backfill_folder_ids(conn)
+        make_photo_session_user_unique(conn)
+
 
-Base.metadata.create_all(bind=engine)
\ No newline at end of file
+if __name__ == "__main__":
+    main()